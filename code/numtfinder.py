@@ -19,8 +19,8 @@
 """
 Module:       NUMTFinder
 Description:  Nuclear mitochondrial fragment (NUMT) search tool
-Version:      0.5.5
-Last Edit:    19/09/23
+Version:      0.8.5
+Last Edit:    14/10/26
 Citation:     Edwards RJ et al. (2021), BMC Genomics [PMID: 33726677]
 GitHub:       https://github.com/slimsuite/numtfinder
 Copyright (C) 2021  Richard J. Edwards - See source code for GNU License Notice
@@ -54,6 +54,7 @@ Commandline:
     dochtml=T/F     : Generate HTML NUMTFinder documentation (*.docs.html) instead of main run [False]
     ### ~ NUMTFinder search options ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
     circle=T/F      : Whether the mtDNA is circular [True]
+    mtdouble=T/F    : Whether to search a double-length mtDNA if circle=T (else stitch hits across the circle join) [True]
     blaste=X        : BLAST+ blastn evalue cutoff for NUMT search [1e-4]
     minfraglen=INT  : Minimum local (NUMT fragment) alignment length (sets GABLAM localmin=X) [10]
     exclude=LIST    : Exclude listed sequence names from search [mtDNA sequence name]
@@ -61,7 +62,9 @@ Commandline:
     mtmaxid=PERC    : Maximum percentage identity of mtDNA hits > mtmaxcov coverage to allow [99]
     mtmaxexclude=T/F: Whether add sequences breaching mtmax filters to the exclude=LIST exclusion list [True]
     keepblast=T/F   : Whether to keep the blast results files rather than delete them [True]
-    forks=INT       : Use multiple threads for the NUMT search [0]
+    searchmethod=X  : NUMT search method: gablam (full GABLAM search), blastn (direct BLAST+ tabular output) or minimap2 (GABLAM mapper=minimap) [gablam]
+    forks=INT       : Use multiple threads for the NUMT search (all but one CPU if not set) [0]
+    searchsplit=T/F : Split the assembly into forks=INT chunks for parallel forked GABLAM searches [False]
     ### ~ NUMTFinder block options ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
     fragmerge=X     : Max Length of gaps between fragmented local hits to merge [8000]
     stranded=T/F    : Whether to only merge fragments on the same strand [False]
@@ -81,13 +84,15 @@ Commandline:
 #########################################################################################################################
 ### SECTION I: GENERAL SETUP & PROGRAM DETAILS                                                                          #
 #########################################################################################################################
-import os, string, sys, time
+import filecmp, hashlib, mmap, os, shutil, string, sys, time
+try: from shlex import quote as shellQuote    # Python 3
+except ImportError: from pipes import quote as shellQuote     # Python 2
 slimsuitepath = os.path.abspath(os.path.join(os.path.dirname(os.path.realpath(__file__)),'../')) + os.path.sep
 sys.path.append(os.path.join(slimsuitepath,'libraries/'))
 sys.path.append(os.path.join(slimsuitepath,'tools/'))
 ### User modules - remember to add *.__doc__ to cmdHelp() below ###
-import rje, rje_db, rje_obj, rje_rmd, rje_seqlist, rje_samtools
-import gablam
+import rje, rje_db, rje_obj, rje_seqlist
+#i# gablam, rje_blast_V2 and rje_samtools are imported when needed to speed up version/help calls
 #########################################################################################################################
 def history():  ### Program History - only a method for PythonWin collapsing! ###
     '''
@@ -105,6 +110,18 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 0.5.3 - Tweaked defaults to put back some smoothing (10bp not 200bp) and min fragment size (10bp)
     # 0.5.4 - Py3 bug fixes.
     # 0.5.5 - Minor underlying code changes.
+    # 0.6.0 - Added searchsplit=T/F to fork the NUMT search over chunks of the assembly.
+    # 0.6.1 - Streamed the double-length mtDNA output rather than building it in memory.
+    # 0.6.2 - Added md5 check of mtdna=FILE to re-use double-length mtDNA with force=T.
+    # 0.7.0 - Added searchmethod=blastn for a direct BLAST+ tabular search without GABLAM.
+    # 0.7.1 - Added mtdouble=F to search the single-copy circular mtDNA and stitch hits spanning the circle join.
+    # 0.7.2 - Added seqin=FILE fingerprint stamp to re-use an existing BLAST database if the assembly is unchanged.
+    # 0.8.0 - Added searchmethod=minimap2 to run the GABLAM NUMT search using minimap2 in place of BLAST+.
+    # 0.8.1 - Added $BASEFILE.fingerprint.tdt of phase inputs and settings to re-run phases with force=F if changed.
+    # 0.8.2 - Regenerate the double-length mtDNA with force=F if the mtdna=FILE md5 has changed.
+    # 0.8.3 - Report mtDNA gap (N) positions and effective length.
+    # 0.8.4 - NUMT search uses all but one CPU if forks=INT is not set.
+    # 0.8.5 - Phases re-run for a changed fingerprint use force=T for their own outputs. Added coverage fingerprint.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -128,8 +145,11 @@ def todo():     ### Major Functionality to Add - only a method for PythonWin col
     '''
 #########################################################################################################################
 def makeInfo(): ### Makes Info object which stores program details, mainly for initial print to screen.
-    '''Makes Info object which stores program details, mainly for initial print to screen.'''
-    (program, version, last_edit, copy_right) = ('NUMTFinder', '0.5.5', 'September 2023', '2021')
+    '''
+    Makes Info object which stores program details, mainly for initial print to screen. This is made once by
+    setupProgram() and passed to cmdHelp(). It is not cached, as the Info start_time is used to time each run.
+    '''
+    (program, version, last_edit, copy_right) = ('NUMTFinder', '0.8.5', 'October 2026', '2021')
     description = 'Nuclear mitochondrial fragment (NUMT) search tool'
     author = 'Dr Richard J. Edwards.'
     comments = ['This program is still in development and has not been published.',rje_obj.zen()]
@@ -141,8 +161,8 @@ def cmdHelp(info=None,out=None,cmd_list=[]):   ### Prints *.__doc__ and asks for
         if not info: info = makeInfo()
         if not out: out = rje.Out()
         ### ~ [2] ~ Look for help commands and print options if found ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-        cmd_help = cmd_list.count('help') + cmd_list.count('-help') + cmd_list.count('-h')
-        if cmd_help > 0:
+        cmd_help = set(['help','-help','-h']) & set(cmd_list)
+        if cmd_help:
             rje.printf('\n\nHelp for {0} {1}: {2}\n'.format(info.program, info.version, time.asctime(time.localtime(info.start_time))))
             out.verbose(-1,4,text=__doc__)
             if rje.yesNo('Show general commandline options?',default='N'): out.verbose(-1,4,text=rje.__doc__)
@@ -164,9 +184,10 @@ def setupProgram(): ### Basic Setup of Program when called from commandline.
     '''
     try:### ~ [1] ~ Initial Command Setup & Info ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
         info = makeInfo()                                   # Sets up Info object with program details
-        if len(sys.argv) == 2 and sys.argv[1] in ['version','-version','--version']: rje.printf(info.version); sys.exit(0)
-        if len(sys.argv) == 2 and sys.argv[1] in ['details','-details','--details']: rje.printf('%s v%s' % (info.program,info.version)); sys.exit(0)
-        if len(sys.argv) == 2 and sys.argv[1] in ['description','-description','--description']: rje.printf('%s: %s' % (info.program,info.description)); sys.exit(0)
+        if len(sys.argv) == 2:
+            if sys.argv[1] in ['version','-version','--version']: rje.printf(info.version); sys.exit(0)
+            if sys.argv[1] in ['details','-details','--details']: rje.printf('%s v%s' % (info.program,info.version)); sys.exit(0)
+            if sys.argv[1] in ['description','-description','--description']: rje.printf('%s: %s' % (info.program,info.description)); sys.exit(0)
         cmd_list = rje.getCmdList(sys.argv[1:],info=info)   # Reads arguments and load defaults from program.ini
         out = rje.Out(cmd_list=cmd_list)                    # Sets up Out object for controlling output to screen
         out.verbose(2,2,cmd_list,1)                         # Prints full commandlist if verbosity >= 2 
@@ -193,6 +214,7 @@ class NUMTFinder(rje_obj.RJE_Object):
     Str:str
     - mtDNA=FILE      : mtDNA reference genome to use for search []
     - mtQuery         : Actual mtDNA fasta file to use for search (double length if circle=T)
+    - SearchMethod=X  : NUMT search method: gablam (full GABLAM search), blastn (direct BLAST+ tabular output) or minimap2 (GABLAM mapper=minimap) [gablam]
     - FasDir=PATH     : Directory in which to save fasta files [numtfasta/]
     - SeqIn=FILE      : Genome assembly in which to search for NUMTs []
 
@@ -202,8 +224,10 @@ class NUMTFinder(rje_obj.RJE_Object):
     - DocHTML=T/F     : Generate HTML Snapper documentation (*.info.html) instead of main run [False]
     - FragFas=T/F     : Whether to output NUMT fragment to fasta file [False]
     - FragRevComp=T/F : Whether to reverse-complement DNA fragments that are on reverse strand to query [True]
+    - MTDouble=T/F    : Whether to search a double-length mtDNA if circle=T (else stitch hits across the circle join) [True]
     - MTMaxExclude=T/F: Whether add sequences breaching mtmax filters to the exclude=LIST exclusion list [True]
     - NoCovFas=T/F    : Whether to output the regions of mtDNA with no coverage [False]
+    - SearchSplit=T/F : Split the assembly into forks=INT chunks for parallel forked GABLAM searches [False]
     - Stranded=T/F    : Whether to only merge fragments on the same strand [False]
 
     Int:integer
@@ -234,8 +258,8 @@ class NUMTFinder(rje_obj.RJE_Object):
     def _setAttributes(self):   ### Sets Attributes of Object
         '''Sets Attributes of Object.'''
         ### ~ Basics ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-        self.strlist = ['mtDNA','mtQuery','FasDir','SeqIn']
-        self.boollist = ['BlockFas','Circle','DocHTML','FragFas','FragRevComp','MTMaxExclude','NoCovFas','Stranded']
+        self.strlist = ['mtDNA','mtQuery','FasDir','SearchMethod','SeqIn']
+        self.boollist = ['BlockFas','Circle','DocHTML','FragFas','FragRevComp','MTDouble','MTMaxExclude','NoCovFas','SearchSplit','Stranded']
         self.intlist = ['FragMerge','MinFragLen']
         self.numlist = ['MTMaxCov','MTMaxID']
         self.filelist = []
@@ -244,8 +268,8 @@ class NUMTFinder(rje_obj.RJE_Object):
         self.objlist = ['DB','GABLAM','mtDNA','SeqIn']
         ### ~ Defaults ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
         self._setDefaults(str='None',bool=False,int=0,num=0.0,obj=None,setlist=True,setdict=True,setfile=True)
-        self.setStr({})
-        self.setBool({'BlockFas':True,'Circle':True,'DocHTML':False,'FragFas':False,'FragRevComp':True,'MTMaxExclude':True,'NoCovFas':False,'Stranded':False})
+        self.setStr({'SearchMethod':'gablam'})
+        self.setBool({'BlockFas':True,'Circle':True,'DocHTML':False,'FragFas':False,'FragRevComp':True,'MTDouble':True,'MTMaxExclude':True,'NoCovFas':False,'SearchSplit':False,'Stranded':False})
         self.setInt({'FragMerge':8000,'MinFragLen':10})
         self.setNum({'MTMaxCov':99.0,'MTMaxID':99.0})
         self.list['Exclude'] = 'mtDNA'
@@ -264,11 +288,11 @@ class NUMTFinder(rje_obj.RJE_Object):
                 self._forkCmd(cmd)  # Delete if no forking
                 ### Class Options (No need for arg if arg = att.lower()) ### 
                 #self._cmdRead(cmd,type='str',att='Att',arg='Cmd')  # No need for arg if arg = att.lower()
-                #self._cmdReadList(cmd,'str',['Att'])   # Normal strings
+                self._cmdReadList(cmd,'str',['SearchMethod'])   # Normal strings
                 self._cmdReadList(cmd,'path',['FasDir'])  # String representing directory path
                 self._cmdReadList(cmd,'file',['mtDNA','SeqIn'])  # String representing file path
                 #self._cmdReadList(cmd,'date',['Att'])  # String representing date YYYY-MM-DD
-                self._cmdReadList(cmd,'bool',['BlockFas','Circle','DocHTML','FragFas','FragRevComp','MTMaxExclude','NoCovFas','Stranded'])  # True/False Booleans
+                self._cmdReadList(cmd,'bool',['BlockFas','Circle','DocHTML','FragFas','FragRevComp','MTDouble','MTMaxExclude','NoCovFas','SearchSplit','Stranded'])  # True/False Booleans
                 self._cmdReadList(cmd,'int',['FragMerge','MinFragLen'])   # Integers
                 #self._cmdReadList(cmd,'float',['Att']) # Floats
                 self._cmdReadList(cmd,'per',['MTMaxCov','MTMaxID']) # Percentages, stored 0-100 (<1 = x100)
@@ -351,6 +375,7 @@ class NUMTFinder(rje_obj.RJE_Object):
         dochtml=T/F     : Generate HTML NUMTFinder documentation (*.docs.html) instead of main run [False]
         ### ~ NUMTFinder search options ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
         circle=T/F      : Whether the mtDNA is circular [True]
+        mtdouble=T/F    : Whether to search a double-length mtDNA if circle=T (else stitch hits across the circle join) [True]
         blaste=X        : BLAST+ blastn evalue cutoff for NUMT search [1e-4]
         minfraglen=INT  : Minimum local (NUMT fragment) alignment length (sets GABLAM localmin=X) [10]
         exclude=LIST    : Exclude listed sequence names from search [mtDNA sequence name]
@@ -358,7 +383,9 @@ class NUMTFinder(rje_obj.RJE_Object):
         mtmaxid=PERC    : Maximum percentage identity of mtDNA hits > mtmaxcov coverage to allow [99]
         mtmaxexclude=T/F: Whether add sequences breaching mtmax filters to the exclude=LIST exclusion list [True]
         keepblast=T/F   : Whether to keep the blast results files rather than delete them [True]
-        forks=INT       : Use multiple threads for the NUMT search [0]
+        searchmethod=X  : NUMT search method: gablam (full GABLAM search), blastn (direct BLAST+ tabular output) or minimap2 (GABLAM mapper=minimap) [gablam]
+        forks=INT       : Use multiple threads for the NUMT search (all but one CPU if not set) [0]
+        searchsplit=T/F : Split the assembly into forks=INT chunks for parallel forked GABLAM searches [False]
         ### ~ NUMTFinder block options ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
         fragmerge=X     : Max Length of gaps between fragmented local hits to merge [8000]
         stranded=T/F    : Whether to only merge fragments on the same strand [False]
@@ -386,7 +413,9 @@ class NUMTFinder(rje_obj.RJE_Object):
         the genome to search for NUMTs (`seqin=FILE`) and the mitochondrial genome to search (`mtdna=FILE`), both in fasta
         format. By default, NUMTFinder expects the mtDNA to be a single full-length circular sequence with no overhangs.
         If this is not the case, switch `circle=F` and NUMTFinder will search all sequences in the file as simple linear
-        sequences. If either file is missing or fails to load a sequence, NUMTFinder will exit.
+        sequences. If either file is missing or fails to load a sequence, NUMTFinder will exit. Summarising a large
+        assembly requires a full pass through `seqin=FILE`, which dominates setup time: set `summarise=F` to skip the
+        sequence summaries if they are not needed (e.g. when re-running with different NUMT merging settings).
 
         By default, any genome sequence matching the mtDNA sequence name(s) will be excluded from the search. This can be
         over-ridden by setting the `exclude=LIST` option. Note that these sequences are still included in the BLAST
@@ -398,8 +427,13 @@ class NUMTFinder(rje_obj.RJE_Object):
         If `circle=T` then NUMTFinder will generate a double-length mtDNA sequence for the actual search. This is to stop
         artificial fragmentation of NUMTs across the circularisation breakpoint. A new double-length sequence will be
         output to `$BASEFILE.mtdna2X.fasta` and used as the query for the [GABLAM](http://rest.slimsuite.unsw.edu.au/gablam)
-        search. This sequence will have "2X" appended to its sequence name. If `force=F` and this file already exists,
-        it will not be recreated.
+        search. (Set `mtdouble=F` to search the single-copy mtDNA instead. This halves the query length, and hence much of
+        the search time, for large assemblies. Hits either side of the circularisation point will then be stitched back
+        together if they are within `minfraglen=INT` bp of the mtDNA ends and each other.)
+        This sequence will have "2X" appended to its sequence name. The md5 hash of `mtdna=FILE` is saved in
+        `*.mtdna2X.fasta.md5`: if this file already exists and the hash matches, it will be re-used (even if `force=T`).
+        If the hash does not match, it will be regenerated (even if `force=F`). Older files without a saved hash are
+        re-used if `force=F`. Set `fullforce=T` to always regenerate it.
 
         ## GABLAM (BLAST+) search
 
@@ -410,6 +444,11 @@ class NUMTFinder(rje_obj.RJE_Object):
         documentation. By default, hits of any length are accepted. This can be made more stringent with `minfraglen=INT`
         to set the minimum fragment lenght in basepairs.
 
+        The `seqin=FILE` BLAST database will be re-used if it already exists and is newer than `seqin=FILE`. A fingerprint
+        of the assembly (file size plus md5 of its first and last 1 Mb) is saved in `$SEQIN.ndb.stamp`. If the BLAST
+        database is older than `seqin=FILE` (e.g. the assembly has been copied or touched) but the fingerprint matches,
+        the database will also be re-used rather than rebuilt. Set `fullforce=T` to ignore the fingerprint.
+
         **NOTE:** The NUMTFinder defaults are set to be reasonably relaxed. In particular, it is possible that repeat
         sequences in the mtDNA might result in multiple, quite short, hits in the search genome. This should be apparent
         in the coverage plot (below).
@@ -419,6 +458,26 @@ class NUMTFinder(rje_obj.RJE_Object):
         `numtfasta/` (`fasdir=PATH`). Parts of the GABLAM output can be switched off with `localsam=F`, `localgff=F` and/or
         `fragfas=F`.
 
+        Alternatively, `searchmethod=blastn` will bypass GABLAM and run BLAST+ `blastn` directly with tabular output
+        (`$BASEFILE.numtsearch.blast6`). Local hits are reduced to unique genome coverage in the same way as GABLAM and saved
+        as `$BASEFILE.numtsearch.local.tdt` and `$BASEFILE.numtsearch.unique.tdt`. This is faster for large assemblies,
+        but no GFF, SAM or fragment fasta output will be generated.
+
+        For very large assemblies, `searchmethod=minimap2` will run GABLAM with `mapper=minimap`, replacing the BLAST+
+        search with [minimap2](https://github.com/lh3/minimap2) (`-x asm20` by default) and PAF parsing by `rje_paf`. This
+        is much faster than `blastn` for long NUMTs but may miss short and/or divergent fragments. Minimap2 options can be
+        set with `mapopt=CDICT` and minimap2 will use `forks=INT` threads. Mock `BitScore` and `Expect` values are
+        output and no fragment fasta files are generated. (`searchsplit=T` is ignored.)
+
+        If `searchmethod=gablam`, `searchsplit=T` and `forks=INT` is greater than one, the assembly will be divided into `forks=INT` chunks of
+        whole sequences, balanced by total sequence length, and a separate GABLAM search will be forked out for each chunk.
+        Each chunk search runs single-threaded BLAST (`blasta=1`), as `blastn` scales better across chunks than threads.
+        The chunk outputs are then combined into the standard `$BASEFILE.numtsearch.*` files and fasta files. Individual
+        chunk searches, including their BLAST results, are kept in `$BASEFILE.numtsearch.chunks/`.
+
+        The search dominates NUMTFinder run time. If neither `forks=INT` nor `threads=INT` is given (and `noforks=F`), the
+        search will use all but one of the available CPUs. Set `forks=1` to force a single-threaded search.
+
 
         ## NUMT filtering
 
@@ -494,6 +553,16 @@ class NUMTFinder(rje_obj.RJE_Object):
 
             python $CODEPATH/rje_seqlist.py -seqin $SEQIN -reformat region -region $START,$END -seqout $SEQOUT -basefile $PREFIX
 
+        ## Re-running NUMTFinder
+
+        With `force=F`, existing NUMT search, NUMT fragment/block and block fasta outputs will be re-used. When each of
+        these phases completes, a fingerprint (full md5) of its input files and settings is saved in `$BASEFILE.fingerprint.tdt`.
+        If the fingerprint for a phase no longer matches then that phase (and those dependent on it) will be re-run with
+        `force=T` for its own outputs, even if `force=F`, so that intermediate files (e.g. BLAST results) are not re-used.
+        The mtDNA coverage outputs are fingerprinted in the same way. For example, changing `fragmerge=INT` or `stranded=T/F` will regenerate the NUMT blocks
+        but re-use the NUMT search, whereas changing `blaste=X` or `minfraglen=INT` will also re-run the search.
+        Outputs without a saved fingerprint (e.g. from NUMTFinder versions prior to v0.8.1) are always re-used.
+
         ---
 
         # NUMTFinder Outputs
@@ -504,10 +573,12 @@ class NUMTFinder(rje_obj.RJE_Object):
         ```
         |-- numtfasta/
         |   +-- $MTACC2X.fas
+        |-- $BASEFILE.fingerprint.tdt
         |-- $BASEFILE.log
         |-- $BASEFILE.mtdna2X.acc.fas
         |-- $BASEFILE.mtdna2X.fasta
         |-- $BASEFILE.mtdna2X.fasta.index
+        |-- $BASEFILE.mtdna2X.fasta.md5
         |-- $BASEFILE.numtblock.fasta
         |-- $BASEFILE.numtblock.tdt
         |-- $BASEFILE.numtfrag.tdt
@@ -547,7 +618,9 @@ class NUMTFinder(rje_obj.RJE_Object):
 
         '''
         try:### ~ [1] ~ Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            if self.getBool('DocHTML'): return rje_rmd.docHTML(self)
+            if self.getBool('DocHTML'):
+                import rje_rmd
+                return rje_rmd.docHTML(self)
             #i# Load the mtDNA and reference genome
             if not self.setup(): return False
             ### ~ [2] ~ Add main run code here ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
@@ -580,6 +653,8 @@ class NUMTFinder(rje_obj.RJE_Object):
                     self.printLog('#MTDNA','Set mtDNA exclusion sequence names: {0}'.format('; '.join(self.list['Exclude'])))
                 else:
                     self.printLog('#MTDNA','Set mtDNA exclusion sequence name: {0}'.format('; '.join(self.list['Exclude'])))
+            #i# NOTE: seqin=FILE is loaded serially rather than in a thread alongside mtQuery(): summarisation is CPU-bound
+            #i# Python (no gain under the GIL) and the shared log is not thread-safe. Use summarise=F to skip this pass.
             self.obj['SeqIn'] = rje_seqlist.SeqList(self.log,['summarise=T']+self.cmd_list+['seqin={0}'.format(self.getStr('SeqIn')),'dna'])
             if not self.obj['SeqIn'].seqNum(): raise IOError('Failed to load sequences from seqin=FILE')
             return True     # Setup successful
@@ -609,29 +684,142 @@ class NUMTFinder(rje_obj.RJE_Object):
     def restOutputOrder(self): return rje.sortKeys(self.dict['Output'])
 #########################################################################################################################
     ### <3> ### Additional Class Methods                                                                                #
+#########################################################################################################################
+    def phaseFingerprint(self,phase):  ### Returns the md5 fingerprint of the input files and settings for a run phase
+        '''
+        Returns the md5 fingerprint of the input files and settings used by a NUMTFinder run phase. This is saved in
+        $BASEFILE.fingerprint.tdt when the phase completes and used to check whether force=F outputs are still valid.
+        Input files are hashed in full, so that any edit is detected: this is cheap compared to the phases it gates.
+        >> phase:str = Run phase (numtsearch/numtprocess/blockfas/coverage)
+        << returns md5 hexdigest string
+        '''
+        try:### ~ [1] Compile phase inputs and settings ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if phase == 'numtsearch':
+                settings = [self.getStrLC('SearchMethod'),self.getInt('MinFragLen'),fileFingerprint(self.getStr('mtQuery'),full=True),fileFingerprint(self.getStr('SeqIn'),full=True)]
+                settings += sorted([cmd.lower() for cmd in self.cmd_list if cmd.lower().startswith(('blast','mapopt','mapper'))])
+            elif phase == 'numtprocess':
+                settings = [fileFingerprint('{0}.numtsearch.unique.tdt'.format(self.basefile()),full=True),self.getInt('mtLen'),self.getInt('MinFragLen'),self.getInt('FragMerge')]
+                settings += [self.getBool(bopt) for bopt in ['Circle','MTDouble','MTMaxExclude','Stranded']]
+                settings += [self.getNum('MTMaxCov'),self.getNum('MTMaxID'),sorted(self.list['Exclude'])]
+            elif phase == 'blockfas':
+                settings = [fileFingerprint('{0}.numtblock.tdt'.format(self.basefile()),full=True),fileFingerprint(self.getStr('SeqIn'),full=True),self.obj['SeqIn'].getBool('UseCase')]
+            elif phase == 'coverage':
+                settings = [fileFingerprint('{0}.numtfrag.tdt'.format(self.basefile()),full=True),self.getInt('mtLen'),self.getInt('MinFragLen')]
+                settings += sorted([cmd.lower() for cmd in self.cmd_list if cmd.lower().startswith(('depth','dirnlen','peak','readlen'))])
+            else: raise ValueError('Unknown NUMTFinder phase "{0}"'.format(phase))
+            ### ~ [2] Return md5 fingerprint ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            return hashlib.md5('{0}'.format(settings).encode('utf-8')).hexdigest()
+        except: self.errorLog('%s.phaseFingerprint error' % self.prog()); return 'None'
+#########################################################################################################################
+    def phaseChanged(self,phase,fingerprint):   ### Returns whether the saved fingerprint for a run phase has changed
+        '''
+        Returns whether the saved $BASEFILE.fingerprint.tdt fingerprint for a run phase differs from the current one.
+        Phases without a saved fingerprint are treated as unchanged, so older force=F outputs are still re-used.
+        >> phase:str = Run phase (numtsearch/numtprocess/blockfas/coverage)
+        >> fingerprint:str = Current phase fingerprint from self.phaseFingerprint(phase)
+        << returns True if the phase needs to be re-run, else False
+        '''
+        saved = self.phaseFingerprints().get(phase,fingerprint)
+        if saved != fingerprint:
+            self.printLog('#RERUN','{0} inputs and/or settings changed since last run: regenerating (force=F)'.format(phase))
+            return True
+        return False
+#########################################################################################################################
+    def phaseFingerprints(self):    ### Returns dictionary of saved {phase:fingerprint} from $BASEFILE.fingerprint.tdt
+        '''Returns dictionary of saved {phase:fingerprint} from $BASEFILE.fingerprint.tdt.'''
+        fingerprints = {}
+        fpfile = '{0}.fingerprint.tdt'.format(self.basefile())
+        if not rje.exists(fpfile): return fingerprints
+        for fline in open(fpfile,'r').readlines()[1:]:
+            data = rje.chomp(fline).split('\t')
+            if len(data) == 2: fingerprints[data[0]] = data[1]
+        return fingerprints
+#########################################################################################################################
+    def savePhase(self,phase,fingerprint):  ### Saves fingerprint of a completed run phase to $BASEFILE.fingerprint.tdt
+        '''
+        Saves the fingerprint of a completed run phase to $BASEFILE.fingerprint.tdt.
+        >> phase:str = Run phase (numtsearch/numtprocess/blockfas/coverage)
+        >> fingerprint:str = Phase fingerprint from self.phaseFingerprint(phase) at the start of the phase
+        '''
+        try:
+            fingerprints = self.phaseFingerprints()
+            fingerprints[phase] = fingerprint
+            FPOUT = open('{0}.fingerprint.tdt'.format(self.basefile()),'w')
+            FPOUT.write('Phase\tFingerprint\n')
+            for fphase in rje.sortKeys(fingerprints): FPOUT.write('{0}\t{1}\n'.format(fphase,fingerprints[fphase]))
+            FPOUT.close()
+        except: self.errorLog('%s.savePhase error' % self.prog())
 #########################################################################################################################
     def mtQuery(self): ### If circular, generate double-length mtDNA sequence
         '''
         If circular, generate double-length mtDNA sequence and update self.str['mtQuery']
         '''
         try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            seq = self.obj['mtDNA'].seqs()[0]
+            mtdna = self.obj['mtDNA']
+            seq = mtdna.seqs()[0]
+            #i# Read the mtDNA sequence once for both its name and length. This is needed even if an existing 2X query is
+            #i# re-used below (mtLen sets the coordinate wrapping), so it comes before the re-use checks, which then skip
+            #i# the whole write pass.
+            (mtname,mtseq) = mtdna.getSeq(seq,format='tuple')
+            self.setInt({'mtLen':len(mtseq)})
+            #i# Gaps are counted with str.count(), which scans in C: mtLen remains the full (coordinate) length
+            mtgaps = mtseq.count('N') + mtseq.count('n')
+            if mtgaps:
+                self.printLog('#MTGAP','{0} mtDNA gap (N) positions: {1} effective length'.format(rje.iStr(mtgaps),rje_seqlist.dnaLen(len(mtseq)-mtgaps)))
             if not self.getBool('Circle'):
                 self.setStr({'mtQuery':self.getStr('mtDNA')})
-                self.setInt({'mtLen': self.obj['mtDNA'].seqLen(seq)})
                 self.printLog('#MTQRY','Using mtdna=FILE input {0} for mtDNA query (circle=F)'.format(self.getStr('mtDNA')))
                 return True
+            if not self.getBool('MTDouble'):
+                self.setStr({'mtQuery':self.getStr('mtDNA')})
+                self.printLog('#MTQRY','Using mtdna=FILE input {0} for mtDNA query (circle=T mtdouble=F)'.format(self.getStr('mtDNA')))
+                return True
             mt2x = rje.baseFile(self.getStr('mtDNA'),strip_path=True)+'2X.fasta'
             self.setStr({'mtQuery':mt2x})
-            self.setInt({'mtLen':self.obj['mtDNA'].seqLen(seq)})
             self.printLog('#MTDNA','Mitochondrial DNA length: {0}'.format(rje_seqlist.dnaLen(self.getInt('mtLen'))))
-            if rje.exists(mt2x) and not self.force():
+            mt2xmd5 = '{0}.md5'.format(mt2x)
+            mtmd5 = rje.file2md5(self.getStr('mtDNA'))
+            #i# Check content hash first: a changed mtdna=FILE should not re-use an old query, even with force=F
+            if rje.exists(mt2x) and rje.exists(mt2xmd5) and not self.fullForce():
+                if open(mt2xmd5,'r').read().strip() == mtmd5:
+                    self.printLog('#MTQRY','Using existing {0} file for mtDNA query (mtdna=FILE md5 match; fullforce=F)'.format(mt2x))
+                    return True
+                self.printLog('#MTQRY','Existing {0} file does not match mtdna=FILE md5: regenerating'.format(mt2x))
+            elif rje.exists(mt2x) and not self.force():
                 self.printLog('#MTQRY','Using existing {0} file for mtDNA query (force=F)'.format(mt2x))
                 return True
             ### ~ [2] Generate double copy query ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            (seqname,sequence) = self.obj['mtDNA'].getSeq(seq)
-            sname = self.obj['mtDNA'].shortName(seq)
-            open(mt2x,'w').write('>{0}2X\n{1}{1}\n'.format(sname,sequence))
+            sname = rje.split(mtname)[0]
+            MT2X = open(mt2x,'wb')
+            MT2X.write('>{0}2X\n'.format(sname).encode())
+            block = None
+            if mtdna.mode() == 'file':
+                #i# Read the mtDNA sequence lines once as bytes and write the block twice: no decoding or doubled string.
+                #i# Reading stops at the first blank line or name line, as SeqList.getSeq() does when mtLen is set.
+                SEQFILE = open(mtdna.getStr('SeqIn'),'rb')
+                SEQFILE.seek(seq)
+                SEQFILE.readline()
+                block = []
+                for line in SEQFILE:
+                    line = line.rstrip(b'\r\n')
+                    if not line or line[:1] == b'>': break
+                    block.append(line)
+                SEQFILE.close()
+                #i# The raw lines must match mtLen, or the circle wrapping would be out: otherwise mtseq is written
+                if sum([len(line) for line in block]) != len(mtseq): block = None
+            if block:
+                block = b'\n'.join(block) + b'\n'
+                if not mtdna.getBool('UseCase'): block = block.upper()
+                MT2X.write(block)
+                MT2X.write(block)
+            else:
+                #i# Encoded once and written twice, with the newline written separately: no doubled or extended copy
+                sequence = mtseq.encode()
+                MT2X.write(sequence)
+                MT2X.write(sequence)
+                MT2X.write(b'\n')
+            MT2X.close()
+            open(mt2xmd5,'w').write('{0}\n'.format(mtmd5))
             self.printLog('#MTQRY','Output double sequence to {0} for mtDNA query (circle=T)'.format(mt2x))
             return True
         except: self.errorLog('%s.mtQuery error' % self.prog())
@@ -651,21 +839,298 @@ class NUMTFinder(rje_obj.RJE_Object):
         try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             wanted = ['.unique.tdt']
             gbase = '{0}.numtsearch'.format(self.basefile())
-            gabrun = self.force() or not rje.checkForFiles(filelist=wanted,basename=gbase,log=self.log,cutshort=True,ioerror=False,missingtext='Not found.')
+            fingerprint = self.phaseFingerprint('numtsearch')
+            #i# rerun=True means that any existing search files are out of date, not just missing the unique hits table
+            rerun = self.force() or self.phaseChanged('numtsearch',fingerprint)
+            gabrun = rerun or not rje.checkForFiles(filelist=wanted,basename=gbase,log=self.log,cutshort=True,ioerror=False,missingtext='Not found.')
             if not gabrun:
                 self.printLog('#SEARCH','NUMT Search results found (force=F). Will re-use')
                 return True
             ### ~ [2] Perform NUMT search ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            import gablam
             gabdefaults = ['blastp=blastn','blasttask=blastn','blaste=1e-4','fasdir=numtfasta/','keepblast=T','fragfas=T']
+            #i# If forks=INT has not been given, use all but one CPU for the search (GABLAM passes this to BLAST as blasta)
+            forkcmds = [cmd for cmd in self.cmd_list if rje.split(cmd,'=')[0].lower().lstrip('-') in ['forks','threads']]
+            if not forkcmds and not self.getBool('NoForks'):
+                self.setInt({'Forks':max(1,cpuCount()-1)})
+                gabdefaults.append('forks={0}'.format(self.getInt('Forks')))
+                self.printLog('#FORKS','Using {0} thread(s) for NUMT search (forks=INT not set)'.format(self.getInt('Forks')))
             gabcmd = ['seqin={0}'.format(self.getStr('mtQuery')),'searchdb={0}'.format(self.getStr('SeqIn')),
                       'basefile={0}.numtsearch'.format(self.basefile()),'localgff=T','localsam=T',
                       'localunique=T','fullblast=T',
                       'localmin={0}'.format(self.getInt('MinFragLen'))]
-            gabobj = gablam.GABLAM(self.log,gabdefaults+self.cmd_list+gabcmd)
-            gabobj.run()
+            #i# A re-run phase must not re-use GABLAM's own BLAST or PAF results from the earlier settings
+            if rerun: gabcmd.append('force=T')
+            method = self.getStrLC('SearchMethod')
+            if method == 'minimap': method = 'minimap2'
+            if method not in ['gablam','blastn','minimap2']:
+                raise ValueError('searchmethod={0} not recognised (gablam/blastn/minimap2)'.format(self.getStr('SearchMethod')))
+            splitrun = method == 'gablam' and self.getBool('SearchSplit') and self.threads() > 1 and self.obj['SeqIn'].seqNum() > 1
+            if method != 'minimap2' and not splitrun: self.blastDBStamp()
+            if method == 'blastn':
+                if not self.blastnSearch(rerun): raise RuntimeError('Direct blastn NUMT search failed')
+            elif method == 'minimap2':
+                gabobj = gablam.GABLAM(self.log,gabdefaults+['mapopt=x:asm20']+self.cmd_list+gabcmd+['mapper=minimap'])
+                gabobj.run()
+            elif splitrun:
+                if not self.splitSearch(gabdefaults+self.cmd_list+gabcmd,rerun): raise RuntimeError('Split NUMT search failed')
+            else:
+                gabobj = gablam.GABLAM(self.log,gabdefaults+self.cmd_list+gabcmd)
+                gabobj.run()
+            if method != 'minimap2' and not splitrun: self.blastDBStamp(save=True)
             rje.checkForFiles(filelist=wanted,basename=gbase,log=self.log,cutshort=True,ioerror=True,missingtext='Not found.')
+            self.savePhase('numtsearch',fingerprint)
             return
         except: self.errorLog('%s.numtSearch error' % self.prog())
+#########################################################################################################################
+    def blastDBStamp(self,save=False):   ### Checks or saves the seqin=FILE fingerprint used to validate its BLAST database
+        '''
+        Checks or saves the `$SEQIN.ndb.stamp` fingerprint (file size plus md5 of the first and last 1 Mb) of the
+        assembly. If the BLAST database files exist but pre-date `seqin=FILE`, a matching fingerprint means that the
+        assembly is unchanged: the BLAST database files are touched so that BLAST+ formatting is skipped. The database
+        files checked match rje_blast_V2.checkForDB(): `nhr`, `nin`, `nsq` and `nog` (`-parse_seqids`) must all exist. Any
+        BLAST+ v5 `ndb`, `njs`, `nos`, `not`, `ntf` and `nto` files present are touched with them.
+        >> save:bool [False] = Whether to save the fingerprint for a current BLAST database rather than check it.
+        << returns True if an existing BLAST database is valid for re-use, else False
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            seqin = self.getStr('SeqIn')
+            stamp = '{0}.ndb.stamp'.format(seqin)
+            dbfiles = []    # Required database files, as checked by rje_blast_V2.checkForDB()
+            for suf in ['nhr','nin','nsq','nog']:
+                if rje.exists('{0}.{1}'.format(seqin,suf)): dbfiles.append('{0}.{1}'.format(seqin,suf))
+                elif rje.exists('{0}.00.{1}'.format(seqin,suf)): dbfiles.append('{0}.00.{1}'.format(seqin,suf))
+            if len(dbfiles) < 4 or not rje.exists(seqin): return False
+            v5files = []    # Optional BLAST+ v5 database files, which are touched along with the required files
+            for suf in ['ndb','njs','nos','not','ntf','nto']:
+                if rje.exists('{0}.{1}'.format(seqin,suf)): v5files.append('{0}.{1}'.format(seqin,suf))
+            fingerprint = fileFingerprint(seqin)
+            current = min([os.path.getmtime(dbfile) for dbfile in dbfiles]) >= os.path.getmtime(seqin)
+            ### ~ [2] Save fingerprint ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if save:
+                if current: open(stamp,'w').write('{0}\n'.format(fingerprint))
+                return current
+            ### ~ [3] Check fingerprint ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if current: return True
+            if self.fullForce() or not rje.exists(stamp): return False
+            if open(stamp,'r').read().strip() != fingerprint:
+                self.printLog('#BLASTDB','{0} fingerprint changed: BLAST database will be regenerated'.format(seqin))
+                return False
+            for dbfile in dbfiles + v5files: os.utime(dbfile,None)
+            self.printLog('#BLASTDB','{0} BLAST database re-used (unchanged ndb.stamp fingerprint; fullforce=F)'.format(seqin))
+            return True
+        except: self.errorLog('%s.blastDBStamp error' % self.prog()); return False
+#########################################################################################################################
+    def blastnSearch(self,rerun=False):     ### Performs a direct BLAST+ blastn search with tabular output and reduces to unique hits
+        '''
+        Performs a direct BLAST+ blastn search of the mtDNA query against the assembly with tabular (`-outfmt 6`) output,
+        bypassing the GABLAM wrapper. Local hits are reduced to unique assembly coverage, as for GABLAM localunique=T:
+        +-- $BASEFILE.numtsearch.blast6
+        +-- $BASEFILE.numtsearch.local.tdt
+        +-- $BASEFILE.numtsearch.unique.tdt
+        No GFF, SAM or fragment fasta output is generated. An existing blast6 file is only re-used if force=F and the
+        search inputs and settings are unchanged (rerun=False).
+        >> rerun:bool [False] = Whether the search phase is being re-run following a change in its fingerprint.
+        << returns True if successful, else False
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            gbase = '{0}.numtsearch'.format(self.basefile())
+            blast6 = '{0}.blast6'.format(gbase)
+            blastcmd = ['blastp=blastn','blasttask=blastn','blaste=1e-4'] + self.cmd_list + ['formatdb=F',
+                        'blasti={0}'.format(self.getStr('mtQuery')),'blastd={0}'.format(self.getStr('SeqIn')),'blasto={0}'.format(blast6)]
+            import rje_blast_V2 as rje_blast
+            blast = rje_blast.BLASTRun(self.log,blastcmd)
+            blast.obj['DB'] = self.obj['DB']
+            blast.formatDB(protein=False,force=False)
+            savefields = ['Query','Hit','AlnID','BitScore','Expect','Length','Identity','Positives','QryStart','QryEnd','SbjStart','SbjEnd']
+            ### ~ [2] Perform blastn search ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if rerun or self.force() or not rje.exists(blast6):
+                #i# blastn writes to a temporary file that only replaces blast6 on success, so that a failed search
+                #i# cannot leave the old blast6 results to be re-used under the new settings
+                if rje.exists(blast6): os.unlink(blast6)
+                blasttmp = '{0}.tmp'.format(blast6)
+                if rje.exists(blasttmp): os.unlink(blasttmp)
+                outfmt = '6 {0} qseq sseq'.format(' '.join(['qseqid','sseqid','bitscore','evalue','length','nident','positive','qstart','qend','sstart','send']))
+                command = '{0}blastn -task {1} -query {2} -db {3} -out {4} -evalue {5:e}'.format(blast.blastPath(),blast.getStrLC('BLASTTask'),blast.getStr('InFile'),blast.getStr('DBase'),blasttmp,blast.getNum('E-Value'))
+                command += ' -dust {0} -soft_masking {1}'.format({True:'yes',False:'no'}[blast.getBool('Complexity Filter')],str(blast.getBool('SoftMask')).lower())
+                command += ' -num_threads {0} -outfmt "{1}"'.format(self.threads(),outfmt)
+                self.printLog('#SYS',command)
+                exitcode = os.system(command)
+                if exitcode: raise RuntimeError('blastn search failed (exit status {0})'.format(exitcode))
+                if not rje.exists(blasttmp): raise IOError('blastn search failed to generate {0}'.format(blasttmp))
+                os.rename(blasttmp,blast6)
+            if not rje.exists(blast6): raise IOError('blastn search failed to generate {0}'.format(blast6))
+            ### ~ [3] Load local hits ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            ldb = self.db().addEmptyTable('local',savefields+['QrySeq','SbjSeq','AlnSeq'],['Query','Hit','AlnID'])
+            alnx = {}
+            #i# Hit IDs are converted back to assembly sequence names (see blastSeqID()), once per ID. Query IDs are not
+            #i# from the (-parse_seqids) database, so only have any lcl| prefix removed.
+            seqnames = set(self.obj['SeqIn'].names())
+            seqids = ({},{})    # Query and Hit dictionaries of {BLAST+ ID:sequence name}
+            for line in open(blast6,'r'):
+                data = rje.chomp(line).split('\t')
+                if len(data) < 13: continue
+                for (i,names) in [(0,set()),(1,seqnames)]:
+                    if data[i] not in seqids[i]: seqids[i][data[i]] = blastSeqID(data[i],names)
+                    data[i] = seqids[i][data[i]]
+                qh = (data[0],data[1])
+                alnx[qh] = alnx.get(qh,0) + 1
+                #i# Identity alignment string, as used by BLASTRun.trimLocal() during reduction
+                alnseq = ''.join(['|' if q == h else ' ' for (q,h) in zip(data[11].upper(),data[12].upper())])
+                entry = {'Query':data[0],'Hit':data[1],'AlnID':alnx[qh],'BitScore':float(data[2]),'Expect':float(data[3]),
+                         'QrySeq':data[11],'SbjSeq':data[12],'AlnSeq':alnseq}
+                for (field,value) in zip(savefields[5:],data[4:11]): entry[field] = int(value)
+                ldb.addEntry(entry)
+            self.printLog('#LOCAL','{0} local blastn hits read from {1}'.format(rje.iStr(ldb.entryNum()),blast6))
+            ldb.saveToFile('{0}.local.tdt'.format(gbase),savefields=savefields)
+            ### ~ [4] Reduce to unique hits ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            udb = blast.reduceLocal(locdb=ldb,sortfield='Identity',minloclen=max(1,self.getInt('MinFragLen')))
+            if not udb: raise ValueError('BLASTRun.reduceLocal() failed.')
+            udb.saveToFile('{0}.unique.tdt'.format(gbase),savefields=savefields)
+            self.db().deleteTable(ldb)
+            self.db().deleteTable(udb)
+            return True
+        except: self.errorLog('%s.blastnSearch error' % self.prog()); return False
+#########################################################################################################################
+    def splitSearch(self,gabcmd,rerun=False):   ### Splits the NUMT search into forked GABLAM searches of assembly chunks
+        '''
+        Splits the seqin=FILE assembly into forks=INT chunks of whole sequences, balanced by total length, and forks out
+        a GABLAM search of the mtDNA query against each chunk. Chunk outputs are then combined into the standard
+        $BASEFILE.numtsearch.* files. Sequences are never split, so unique hit reduction is unaffected. Chunk searches,
+        including their BLAST and hitsum files, are kept in $BASEFILE.numtsearch.chunks/. Chunk fasta files are regenerated
+        for every search: chunk searches are re-run (force=T) if their chunk has changed or rerun=True, and files from
+        any previous chunks beyond the current number are deleted. Existing outputs of re-run chunk searches are deleted
+        before forking, and every chunk must generate its local and unique hit tables for the search to succeed.
+        >> gabcmd:list = GABLAM commands for the full (unsplit) search.
+        >> rerun:bool [False] = Whether the search phase is being re-run following a change in its fingerprint.
+        << returns True if successful, else False
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            seqin = self.obj['SeqIn']
+            gbase = '{0}.numtsearch'.format(self.basefile())
+            chunkdir = rje.makePath('{0}.chunks/'.format(gbase))
+            if not rje.exists(chunkdir): rje.mkDir(self,chunkdir)
+            fasdir = rje.makePath('numtfasta/')
+            for cmd in gabcmd:
+                if cmd.lower().startswith('fasdir='): fasdir = rje.makePath(cmd.split('=',1)[1])
+            import gablam, rje_forker
+            gabpy = '{0}.py'.format(os.path.splitext(os.path.realpath(gablam.__file__))[0])
+            ## ~ [1a] Assign whole sequences to length-balanced chunks ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+            chunkx = min(self.threads(),seqin.seqNum())
+            chunks = [[] for i in range(chunkx)]
+            chunklen = [0] * chunkx
+            seqlen = {}     # Read each sequence once for its length: seqLen() re-reads the sequence
+            for seq in seqin.seqs(): seqlen[seq] = seqin.seqLen(seq)
+            for seq in sorted(seqin.seqs(),key=seqlen.get,reverse=True):
+                i = chunklen.index(min(chunklen))
+                chunks[i].append(seq)
+                chunklen[i] += seqlen[seq]
+            self.printLog('#SPLIT','{0} assembly sequences split into {1} chunks for forked NUMT search'.format(rje.iStr(seqin.seqNum()),chunkx))
+            ## ~ [1b] Remove files from previous chunks beyond the current number ~~~~~~~~~~~~~~~~~ ##
+            #i# Chunk outputs are only combined for the current chunks, but old ones are removed so they cannot be mistaken
+            cleanx = 0
+            for cfile in os.listdir(chunkdir):
+                cnum = cfile[5:].split('.')[0]
+                if not cfile.startswith('chunk') or not cnum.isdigit() or int(cnum) <= chunkx: continue
+                cpath = os.path.join(chunkdir,cfile)
+                if os.path.isdir(cpath): shutil.rmtree(cpath)
+                else: os.unlink(cpath)
+                cleanx += 1
+            if cleanx: self.printLog('#CLEAN','{0} old chunk files removed from {1}'.format(rje.iStr(cleanx),chunkdir))
+            ### ~ [2] Generate chunk fasta files and GABLAM commands ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            forker = rje_forker.Forker(self.log,['logfork=F']+self.cmd_list)
+            forker.list['ToFork'] = []
+            chunkbase = []
+            for i in range(chunkx):
+                cbase = '{0}chunk{1}'.format(chunkdir,i+1)
+                chunkbase.append(cbase)
+                chunkfas = '{0}.fasta'.format(cbase)
+                #i# Each chunk is written to a temporary file, which only replaces the existing chunk if the contents differ.
+                #i# Unchanged chunks keep their file age, so their BLAST databases and search results remain valid.
+                chunktmp = '{0}.tmp'.format(chunkfas)
+                CHUNK = open(chunktmp,'w')
+                for seq in chunks[i]: CHUNK.write('>{0}\n{1}\n'.format(*seqin.getSeq(seq)))
+                CHUNK.close()
+                chunkforce = rerun or self.force() or not rje.exists(chunkfas) or not filecmp.cmp(chunkfas,chunktmp,shallow=False)
+                if chunkforce: os.rename(chunktmp,chunkfas)
+                else: os.unlink(chunktmp)
+                #i# Outputs of re-run chunk searches are removed first, so a failed search cannot leave old results to combine.
+                #i# The chunk fasta and its BLAST database files ($CHUNK.fasta.*) are kept.
+                if chunkforce:
+                    cprefix = '{0}.'.format(os.path.basename(cbase))
+                    for cfile in os.listdir(chunkdir):
+                        if not cfile.startswith(cprefix) or cfile.startswith('{0}fasta'.format(cprefix)): continue
+                        cpath = os.path.join(chunkdir,cfile)
+                        if os.path.isdir(cpath): shutil.rmtree(cpath)
+                        else: os.unlink(cpath)
+                chunkcmd = gabcmd + ['searchdb={0}'.format(chunkfas),'basefile={0}'.format(cbase),'fasdir={0}.fas/'.format(cbase),
+                                     'log={0}.log'.format(cbase),'forks=0','blasta=1','i=-1']
+                if chunkforce: chunkcmd.append('force=T')
+                #i# Forked commands are run through the shell, so every element (including the paths) is shell-quoted
+                forker.list['ToFork'].append(' '.join([shellQuote(cmd) for cmd in [sys.executable,gabpy] + chunkcmd]))
+            ### ~ [3] Fork out chunk searches ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if not forker.run(): raise RuntimeError('Forked NUMT search did not complete')
+            #i# Forked jobs do not return an exit status, so chunk searches are checked for their hit tables
+            failed = []
+            for cbase in chunkbase:
+                if not rje.exists('{0}.local.tdt'.format(cbase)) or not rje.exists('{0}.unique.tdt'.format(cbase)): failed.append(cbase)
+            if failed: raise IOError('{0} chunk search(es) failed to generate local/unique hit tables: {1}'.format(len(failed),', '.join(failed)))
+            ### ~ [4] Combine chunk outputs ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            #i# Delimited tables are needed from every chunk: GFF and SAM outputs are optional
+            for ext in ['gablam.tdt','local.tdt','unique.tdt','local.gff','unique.gff','local.sam','unique.sam']:
+                if not self.combineChunks(['{0}.{1}'.format(cbase,ext) for cbase in chunkbase],'{0}.{1}'.format(gbase,ext),required=ext.endswith('.tdt')) and ext.endswith('.tdt'):
+                    raise IOError('Failed to combine chunk {0} files'.format(ext))
+            ## ~ [4a] Combine fragment fasta files ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+            fasfiles = []
+            for cbase in chunkbase:
+                if not rje.exists('{0}.fas/'.format(cbase)): continue
+                for fasfile in os.listdir('{0}.fas/'.format(cbase)):
+                    if fasfile not in fasfiles: fasfiles.append(fasfile)
+            if fasfiles and not rje.exists(fasdir): rje.mkDir(self,fasdir)
+            for fasfile in fasfiles:
+                self.combineChunks(['{0}.fas/{1}'.format(cbase,fasfile) for cbase in chunkbase],'{0}{1}'.format(fasdir,fasfile),headers=False)
+            return True
+        except: self.errorLog('%s.splitSearch error' % self.prog()); return False
+#########################################################################################################################
+    def combineChunks(self,chunkfiles,outfile,headers=True,required=False):   ### Combines split search chunk files into a single file
+        '''
+        Combines split search chunk files into a single file. Headers are taken from the first chunk file, with the
+        exception of SAM @SQ lines, which are kept for all chunks.
+        >> chunkfiles:list = List of chunk files to combine. Missing files will be skipped unless required=True.
+        >> outfile:str = Combined output file.
+        >> headers:bool [True] = Whether files have header lines (TDT first line and/or #/@ lines).
+        >> required:bool [False] = Whether every chunk file must exist. (Optional GFF, SAM and fasta outputs may be missing.)
+        << returns True if output generated, else False
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            missing = [cfile for cfile in chunkfiles if not rje.exists(cfile)]
+            if missing and required: raise IOError('{0} required chunk files missing: {1}'.format(len(missing),', '.join(missing)))
+            chunkfiles = [cfile for cfile in chunkfiles if cfile not in missing]
+            if not chunkfiles: return False
+            tdt = outfile.endswith('.tdt')
+            rje.backup(self,outfile,appendable=False)
+            OUT = open(outfile,'wb')
+            ### ~ [2] Combine headers then content ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            #i# Header lines are only read at the start of each file: once the first content line is reached, the
+            #i# rest of the chunk file is copied across in large binary blocks.
+            for content in [False,True]:
+                for cfile in chunkfiles:
+                    first = cfile == chunkfiles[0]
+                    CHUNK = open(cfile,'rb')
+                    line = CHUNK.readline()
+                    if headers:
+                        while line and (tdt or line[:1] in b'#@'):
+                            if not content and (first or line.startswith(b'@SQ')): OUT.write(line)
+                            line = CHUNK.readline()
+                            if tdt: break
+                    if content:
+                        OUT.write(line)
+                        shutil.copyfileobj(CHUNK,OUT,1048576)
+                    CHUNK.close()
+            OUT.close()
+            self.printLog('#CHUNKS','{0} chunk files combined into {1}'.format(len(chunkfiles),outfile))
+            return True
+        except: self.errorLog('%s.combineChunks error' % self.prog()); return False
 #########################################################################################################################
     def numtProcess(self):      ### Load in NUMT results as numtfrag and merge to numtblock
         '''
@@ -677,7 +1142,8 @@ class NUMTFinder(rje_obj.RJE_Object):
             ## ~ [1a] Check and load existing data ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
             fragout = '{0}.numtfrag.tdt'.format(self.basefile())
             blockout = '{0}.numtblock.tdt'.format(self.basefile())
-            if not self.force() and rje.checkForFiles(filelist=[fragout,blockout],basename='',log=self.log,cutshort=True,ioerror=False,missingtext='Not found.'):
+            fingerprint = self.phaseFingerprint('numtprocess')
+            if not self.force() and rje.checkForFiles(filelist=[fragout,blockout],basename='',log=self.log,cutshort=True,ioerror=False,missingtext='Not found.') and not self.phaseChanged('numtprocess',fingerprint):
                 fragdb = self.db().addTable(fragout,mainkeys=['SeqName','Start','End','Strand'],name='numtfrag',expect=True,replace=True,uselower=False)
                 fragdb.dataFormat({'BitScore':'num','Start':'int','End':'int','mtStart':'int','mtyEnd':'int','Expect':'num','Length':'int','Identity':'int'})
                 blockdb = self.db().addTable(blockout,mainkeys=['SeqName','Start','End','Strand'],name='numtblock',expect=True,replace=True,uselower=False)
@@ -685,94 +1151,202 @@ class NUMTFinder(rje_obj.RJE_Object):
                 self.printLog('#RESUME','Picked up previous tables of results (force=F)')
                 return True
             ### ~ [2] Load NUMT fragments ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            fragdb = self.db().addTable(numtfrag,mainkeys=['Query','Hit','SbjStart','SbjEnd'],name='numtfrag',expect=True,replace=True,uselower=False)
-            fragdb.dropFields(['Positives'])
+            #i# Positives is not used downstream: leaving it out of datakeys means it is never stored or passed to dataFormat()
+            fragfields = ['Query','Hit','AlnID','BitScore','Expect','Length','Identity','QryStart','QryEnd','SbjStart','SbjEnd']
+            fragdb = self.db().addTable(numtfrag,mainkeys=['Query','Hit','SbjStart','SbjEnd'],datakeys=fragfields,name='numtfrag',expect=True,replace=True,uselower=False)
             fragdb.dataFormat({'BitScore':'num','SbjStart':'int','SbjEnd':'int','QryStart':'int','QryEnd':'int','AlnID':'int','Expect':'num','Length':'int','Identity':'int'})
             if not fragdb: raise ValueError('Unable to load {0}!'.format(numtfrag))
+            if self.getBool('Circle') and not self.getBool('MTDouble'): self.circleStitch(fragdb)
             ## ~ [2a] Filter ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
             prefiltx = fragdb.entryNum()
-            filt = []
+            exclude = set(self.list['Exclude'])     # Set of excluded sequence names for fast membership tests
             mtid = max(0.0,self.getPerc('MTMaxID'))
             mtcov = max(0.0,self.getPerc('MTMaxCov'))
-            for entry in fragdb.entries():
-                if mtid and mtcov and ((entry['QryEnd'] - entry['QryStart'] + 1) / mtlen) > mtcov and (entry['Identity']/entry['Length']) > mtid:
-                    filt.append(entry)
+            #i# A single pass over the fragments buckets entry keys by Hit and finds suspected mtDNA fragments. The Hit
+            #i# buckets replace building (and then rebuilding) a Hit index for the checks and exclusion drops below.
+            #i# Thresholds are scaled once and compared by multiplication: no per-entry (or Python 2 integer) division
+            filtmt = mtid and mtcov
+            mincov = mtcov * mtlen
+            hitkeys = {}    # Dictionary of {Hit:[entry keys]}
+            filt = []       # List of suspected (non-NUMT) mtDNA fragment entry keys
+            for (key,entry) in fragdb.dict['Data'].items():
+                if entry['Hit'] in hitkeys: hitkeys[entry['Hit']].append(key)
+                else: hitkeys[entry['Hit']] = [key]
+                if filtmt and (entry['QryEnd'] - entry['QryStart'] + 1) > mincov and entry['Identity'] > mtid * entry['Length']: filt.append(key)
             if filt:
-                filtseq = fragdb.dataList(filt,'Hit')
-                fragdb.dropEntryList(filt,logtxt='Suspected non-NUMT mtDNA')
-                fragdb.index('Hit')
+                filtseq = []; filtx = {}    # Suspected mtDNA sequence names (in order) and their filtered fragment counts
+                for key in filt:
+                    sname = fragdb.dict['Data'][key]['Hit']
+                    if sname not in filtx: filtseq.append(sname); filtx[sname] = 0
+                    filtx[sname] += 1
+                fragdb.dropEntries(filt,keylist=True,logtxt='Suspected non-NUMT mtDNA')
                 self.printLog('#MTFRAG','{0} suspected (non-NUMT) mtDNA sequence(s) ({1} fragment(s) >{2:.1f}% coverage @ >{3:.1f}% identity)'.format(len(filtseq),len(filt),mtcov*100,mtid*100))
                 for sname in filtseq:
-                    if sname in self.list['Exclude']: self.printLog('#MTSEQ','{0} already in exclude=LIST'.format(sname))
+                    if sname in exclude: self.printLog('#MTSEQ','{0} already in exclude=LIST'.format(sname))
                     elif self.getBool('MTMaxExclude'):
                         self.printLog('#MTSEQ','{0} added to exclude=LIST (mtmaxexclude=T)'.format(sname))
-                        self.list['Exclude'].append(sname)
-                    elif sname in fragdb.index('Hit'):
+                        self.list['Exclude'].append(sname); exclude.add(sname)
+                    elif len(hitkeys[sname]) > filtx[sname]:
                         self.warnLog('Suspected mtDNA sequence {0} has additional unfiltered NUMT fragments'.format(sname))
-            if self.list['Exclude']:
-                fragdb.dropEntriesDirect('Hit',self.list['Exclude'])
+            exkeys = []
+            for sname in exclude:
+                for key in hitkeys.get(sname,[]):
+                    if key in fragdb.dict['Data']: exkeys.append(key)
+            if exkeys:
+                fragdb.dropEntries(exkeys,keylist=True,logtxt='Excluded sequences (exclude=LIST)')
             if prefiltx != fragdb.entryNum():
                 self.warnLog('{0} mtDNA fragment(s) filtered as suspected (non-NUMT) mtDNA sequences.'.format(prefiltx-fragdb.entryNum()))
             ## ~ [2b] Reformat ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-            fragdb.renameField('Hit','SeqName')
-            fragdb.renameField('SbjStart','Start')
-            fragdb.renameField('SbjEnd','End')
-            fragdb.renameField('QryStart','mtStart')
-            fragdb.renameField('QryEnd','mtEnd')
-            fragdb.addField('Strand',evalue='+')
-            for entry in fragdb.entries():
-                if entry['End'] < entry['Start']:
-                    entry['Strand'] = '-'
-                    (entry['End'],entry['Start']) = (entry['Start'],entry['End'])
-            fragdb.setFields('SeqName	Start	End	Strand	BitScore	Expect	Length	Identity	mtStart	mtEnd'.split())
-            fragdb.newKey(['SeqName','Start','End','Strand'])
-            if self.getBool('Circle'):
-                for entry in fragdb.entries():
+            fragdb.renameFields({'Hit':'SeqName','SbjStart':'Start','SbjEnd':'End','QryStart':'mtStart','QryEnd':'mtEnd'})
+            #i# Set the Strand field, swap reverse strand coordinates and map double-length mtDNA positions back onto
+            #i# the circular mtDNA in a single pass over the table data (no entries() list copy)
+            circle = self.getBool('Circle')
+            for entry in fragdb.dict['Data'].values():
+                (start,end) = (entry['Start'],entry['End'])
+                if end < start: (entry['Start'],entry['End'],entry['Strand']) = (end,start,'-')
+                else: entry['Strand'] = '+'
+                if circle:
                     if entry['mtStart'] > mtlen: entry['mtStart'] -= mtlen
                     if entry['mtEnd'] > mtlen: entry['mtEnd'] -= mtlen
+            if 'Strand' not in fragdb.fields(): fragdb.list['Fields'].append('Strand')
+            fragdb.setFields('SeqName	Start	End	Strand	BitScore	Expect	Length	Identity	mtStart	mtEnd'.split())
+            fragdb.newKey(['SeqName','Start','End','Strand'])
             fragdb.saveToFile()
 
             ### ~ [3] Merge NUMT fragments ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            fragmerge = self.getInt('FragMerge')
-            stranded = self.getBool('Stranded')
-            blockdb = self.db().copyTable(fragdb,'numtblock')
-            blockdb.addField('mtFrag',evalue='')
-            blockdb.addField('FragNum',evalue=1)
-            blockdb.addField('FragLen',evalue=0)
-            blockdb.addField('FragGaps',evalue=0)
-            prevfrag = None
-            frags = blockdb.entries(sorted=True)
-            blocks = []     # New list of entries for NUMT blocks
-            while frags:
-                self.progLog('\r#MERGE','Merging NUMT fragments within {0}: {1} frags -> {2} blocks.   '.format(rje_seqlist.dnaLen(fragmerge),rje.iLen(frags),rje.iLen(blocks)))
-                nextfrag = frags.pop(0)
-                nextfrag['FragLen'] = nextfrag['End'] - nextfrag['Start'] + 1
-                merge = prevfrag and prevfrag['SeqName'] == nextfrag['SeqName'] and (nextfrag['Start'] - prevfrag['End']) <= fragmerge
-                if stranded: merge = merge and prevfrag['Strand'] == nextfrag['Strand']
-                if merge:
-                    prevfrag['FragGaps'] += (nextfrag['Start'] - prevfrag['End'] - 1)
-                    prevfrag['End'] = nextfrag['End']
-                    prevfrag['Expect'] = min(nextfrag['Expect'],prevfrag['Expect'])
-                    for field in ['BitScore','Length','Identity','FragNum','FragLen']:
-                        prevfrag[field] += nextfrag[field]
-                    prevfrag['mtFrag'] = '{0}|{1}-{2}'.format(prevfrag['mtFrag'],nextfrag['mtStart'], nextfrag['mtEnd'])
-                    if prevfrag['Strand'] != nextfrag['Strand']: prevfrag['Strand'] = '+/-'
-                else:
-                    prevfrag = nextfrag
-                    blocks.append(prevfrag)
-                    prevfrag['mtFrag'] = '{0}-{1}'.format(prevfrag['mtStart'],prevfrag['mtEnd'])
-                    continue
-            self.printLog('\r#MERGE','Merging NUMT fragments within {0} complete: {1} frags -> {2} blocks'.format(rje_seqlist.dnaLen(fragmerge),rje.iStr(fragdb.entryNum()),rje.iLen(blocks)))
+            #i# numtblock starts empty rather than as a copy of numtfrag: only the first fragment of each merged block is
+            #i# copied, by mergeFragments(). numtfrag itself is left intact for coverageOutputs(). The mtStart and mtEnd fields are only
+            #i# needed to build mtFrag, and block fields are set per block, so no addField() or dropFields() passes are needed.
+            if self.db().getTable('numtblock'): self.db().deleteTable('numtblock')
+            blockfields = [field for field in fragdb.fields() if field not in ['mtStart','mtEnd']] + ['mtFrag','FragNum','FragLen','FragGaps']
+            blockdb = self.db().addEmptyTable('numtblock',blockfields,fragdb.keys())
+            blocks = self.mergeFragments(fragdb)
             ## ~ [3a] Update blockdb data ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-            blockdata = {}
-            for entry in blocks:
-                bkey = (entry['SeqName'],entry['Start'],entry['End'],entry['Strand'])
-                entry['Length'] = entry['End'] - entry['Start'] + 1
-                blockdata[bkey] = entry
-            blockdb.dict['Data'] = blockdata
-            blockdb.dropFields(['mtStart','mtEnd'])
+            #i# Blocks arrive with Length already set, so the table data is built in a single pass
+            blockdb.dict['Data'] = dict([((entry['SeqName'],entry['Start'],entry['End'],entry['Strand']),entry) for entry in blocks])
             blockdb.saveToFile()
+            self.savePhase('numtprocess',fingerprint)
         except: self.errorLog('%s.numtProcess error' % self.prog()); raise
+#########################################################################################################################
+    def mergeFragments(self,fragdb,fragmerge=None,stranded=None):  ### Merges sorted NUMT fragments into NUMT blocks
+        '''
+        Merges NUMT fragments into NUMT blocks. Fragments on the same sequence are sorted by position and merged when the
+        gap between them is no more than fragmerge=INT bp and, if stranded=T, they are on the same strand. This is a single
+        sort-then-sweep per sequence, so scales as O(n log n) with the number of fragments.
+        >> fragdb:Table = numtfrag table keyed on SeqName, Start, End, Strand. Entries are not modified.
+        >> fragmerge:int [None] = Max distance between fragments for merging. (Will use fragmerge=INT if None.)
+        >> stranded:bool [None] = Whether to only merge fragments on the same strand. (Will use stranded=T/F if None.)
+        << returns list of new block entries, without mtStart and mtEnd fields.
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            if fragmerge == None: fragmerge = self.getInt('FragMerge')
+            if stranded == None: stranded = self.getBool('Stranded')
+            blocks = []     # New list of entries for NUMT blocks
+            fragx = 0       # Number of fragments processed
+            ### ~ [2] Group fragments by sequence and identify block boundaries ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            #i# Within each sequence, a fragment starts a new block if it is more than fragmerge from the end of the
+            #i# previous fragment, or (stranded=T) on a different strand. Merged blocks always end with their last fragment.
+            #i# Sequences are merged independently but serially: each merge is a single linear pass over its fragments,
+            #i# which is cheaper than pickling the entries out to forked processes and back.
+            #i# Keys are (SeqName,Start,End,Strand): grouping on SeqName first means that each group only needs sorting
+            #i# on positions, rather than sorting every key together. The existing key tuples are sorted as they are:
+            #i# the shared SeqName compares by identity, so no new position tuples need building for each fragment.
+            seqkeys = {}    # Dictionary of {SeqName:[(SeqName,Start,End,Strand)]}
+            for key in fragdb.dict['Data']:
+                if key[0] not in seqkeys: seqkeys[key[0]] = []
+                seqkeys[key[0]].append(key)
+            mergetxt = rje_seqlist.dnaLen(fragmerge)
+            colfields = ['Start','End','Strand','BitScore','Expect','Identity']   # Fields pulled into column lists
+            #i# Blocks only copy the fragment fields they keep: mtStart and mtEnd are summarised in mtFrag instead
+            copyfields = [field for field in fragdb.fields() if field not in ['mtStart','mtEnd']]
+            for (seqx,seqname) in enumerate(rje.sortKeys(seqkeys)):
+                #i# Progress is only updated every 1000 sequences, as fragmented assemblies can have very many sequences
+                if not seqx % 1000: self.progLog('\r#MERGE','Merging NUMT fragments within {0}: {1} frags -> {2} blocks.   '.format(mergetxt,rje.iStr(fragx),rje.iLen(blocks)))
+                seqfrags = [fragdb.dict['Data'][key] for key in sorted(seqkeys.pop(seqname))]
+                fragx += len(seqfrags)
+                #i# Fragment fields are pulled into per-sequence column lists once, so that the boundary scan and the
+                #i# block reductions below work on list slices rather than repeated dictionary lookups
+                cols = dict([(field,[frag[field] for frag in seqfrags]) for field in colfields])
+                (starts,ends,strands) = (cols['Start'],cols['End'],cols['Strand'])
+                #i# Each fragment's mtFrag text is formatted once: blocks then take or join these without re-formatting
+                mtfrags = ['{0}-{1}'.format(frag['mtStart'],frag['mtEnd']) for frag in seqfrags]
+                cuts = [i for i in range(1,len(seqfrags)) if starts[i] - ends[i-1] > fragmerge or (stranded and strands[i] != strands[i-1])]
+                cuts = [0] + cuts + [len(seqfrags)]
+                ## ~ [2a] Merge each run of fragments into a block ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+                for (bstart,bend) in zip(cuts[:-1],cuts[1:]):
+                    first = seqfrags[bstart]
+                    block = dict([(field,first[field]) for field in copyfields])
+                    block['FragNum'] = bend - bstart
+                    #i# Single-fragment blocks are the most common, and need no column slicing or reductions
+                    if bend - bstart == 1:
+                        block['mtFrag'] = mtfrags[bstart]
+                        block['Length'] = block['FragLen'] = ends[bstart] - starts[bstart] + 1
+                        block['FragGaps'] = 0
+                    else:
+                        block['mtFrag'] = '|'.join(mtfrags[bstart:bend])
+                        block['FragLen'] = sum(ends[bstart:bend]) - sum(starts[bstart:bend]) + bend - bstart
+                        block['FragGaps'] = sum(starts[bstart+1:bend]) - sum(ends[bstart:bend-1]) - (bend - bstart - 1)
+                        block['End'] = ends[bend-1]
+                        block['Expect'] = min(cols['Expect'][bstart:bend])
+                        block['BitScore'] = sum(cols['BitScore'][bstart:bend])
+                        block['Identity'] = sum(cols['Identity'][bstart:bend])
+                        if len(set(strands[bstart:bend])) > 1: block['Strand'] = '+/-'
+                        #i# Block Length is the full block span, whereas FragLen is the summed length of its fragments
+                        block['Length'] = ends[bend-1] - starts[bstart] + 1
+                    blocks.append(block)
+            self.printLog('\r#MERGE','Merging NUMT fragments within {0} complete: {1} frags -> {2} blocks'.format(mergetxt,rje.iStr(fragdb.entryNum()),rje.iLen(blocks)))
+            return blocks
+        except: self.errorLog('%s.mergeFragments error' % self.prog()); raise
+#########################################################################################################################
+    def circleStitch(self,fragdb):  ### Stitches single-copy mtDNA hits that span the circularisation point
+        '''
+        Stitches unique hits to a single-copy circular mtDNA (mtdouble=F) that span the circularisation point. A hit
+        reaching the end of the mtDNA is joined to a hit to the start of the mtDNA that continues it on the same hit
+        sequence and strand. Ends and joins are allowed to be out by up to minfraglen=INT bp. The joined hit is given
+        double-length mtDNA coordinates (QryEnd > mtLen), matching the hits from a mtdouble=T search.
+        >> fragdb:Table = Unique hits table loaded from $BASEFILE.numtsearch.unique.tdt (modified in place).
+        << returns number of stitched hits
+        '''
+        try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            mtlen = self.getInt('mtLen')
+            wrapx = max(0,self.getInt('MinFragLen'))
+            #i# Hits are only compared within (Hit,Fwd) buckets. Entries are not dropped until after both passes, so the table
+            #i# data is iterated directly rather than copied into entries() lists.
+            fragdata = fragdb.dict['Data'].values()
+            starts = {}     # Dictionary of {(Hit,Fwd):[entries]} for hits to the start of the mtDNA
+            for entry in fragdata:
+                if entry['QryStart'] <= wrapx + 1:
+                    skey = (entry['Hit'],entry['SbjStart'] <= entry['SbjEnd'])
+                    if skey not in starts: starts[skey] = []
+                    starts[skey].append(entry)
+            ### ~ [2] Stitch hits ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            stitched = []   # List of start entries that have been stitched onto end entries
+            joins = []      # List of (end entry, start entry) pairs to stitch
+            used = set()    # Set of id() for entries already used in a join
+            for entry in fragdata:
+                if entry['QryEnd'] < mtlen - wrapx or id(entry) in used: continue
+                fwd = entry['SbjStart'] <= entry['SbjEnd']
+                for sentry in starts.get((entry['Hit'],fwd),[]):
+                    if sentry is entry or id(sentry) in used: continue
+                    if fwd: join = sentry['SbjStart'] - entry['SbjEnd'] - 1
+                    else: join = entry['SbjEnd'] - sentry['SbjStart'] - 1
+                    if abs(join) > wrapx: continue
+                    joins.append((entry,sentry)); stitched.append(sentry)
+                    used.add(id(entry)); used.add(id(sentry))
+                    break
+            if not joins:
+                self.printLog('#CIRCLE','No NUMT fragments spanning mtDNA circularisation point (mtdouble=F)')
+                return 0
+            fragdb.dropEntryList(stitched,logtxt='Stitched across mtDNA circularisation')
+            for (entry,sentry) in joins:
+                entry['QryEnd'] = sentry['QryEnd'] + mtlen
+                entry['SbjEnd'] = sentry['SbjEnd']
+                entry['Expect'] = min(entry['Expect'],sentry['Expect'])
+                for field in ['BitScore','Length','Identity']: entry[field] += sentry[field]
+            fragdb.remakeKeys()
+            self.printLog('#CIRCLE','{0} NUMT fragments stitched across mtDNA circularisation point (mtdouble=F)'.format(rje.iLen(stitched)))
+            return len(stitched)
+        except: self.errorLog('%s.circleStitch error' % self.prog()); raise
 #########################################################################################################################
     def blockFasta(self):  ### Outputs NUMT blocks as fasta tile
         '''
@@ -785,7 +1359,8 @@ class NUMTFinder(rje_obj.RJE_Object):
                 self.printLog('#BLOCK','No NUMT blocks: no {0} output.'.format(seqout))
                 return False
             ## ~ [1a] Check old output ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-            if not self.force() and rje.checkForFiles(filelist=[seqout],basename='',log=self.log,cutshort=True,ioerror=False,missingtext='Not found.'):
+            fingerprint = self.phaseFingerprint('blockfas')
+            if not self.force() and rje.checkForFiles(filelist=[seqout],basename='',log=self.log,cutshort=True,ioerror=False,missingtext='Not found.') and not self.phaseChanged('blockfas',fingerprint):
                 seqcheck = rje_seqlist.SeqList(self.log,self.cmd_list+['summarise=F','seqin={0}'.format(seqout),'dna'])
                 self.printLog('\r#BLOCK','Found {0} fasta output for {1} out of {2} NUMT blocks (force=F)'.format(seqout,rje.iStr(seqcheck.seqNum()),rje.iStr(blockdb.entryNum())))
                 if seqcheck.seqNum() == blockdb.entryNum():
@@ -795,21 +1370,32 @@ class NUMTFinder(rje_obj.RJE_Object):
             seqin = self.obj['SeqIn']
             seqdict = seqin.seqNameDic()
             rje.backup(self,seqout)
+            ## ~ [1c] Memory-map the assembly for direct sequence reads ~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+            seqmap = None
+            if seqin.mode() == 'file':
+                try:
+                    SEQMAP = open(seqin.getStr('SeqIn'),'rb')
+                    seqmap = mmap.mmap(SEQMAP.fileno(),0,access=mmap.ACCESS_READ)
+                    SEQMAP.close()
+                except: self.warnLog('Failed to memory-map {0}: will read sequences with SeqList'.format(seqin.getStr('SeqIn'))); seqmap = None
             ### ~ [2] Output NUMT blocks ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             wmode = 'w'
             if self.getBool('Append'): wmode = 'a'
             SEQOUT = open(seqout,wmode)
-            outx = 0; ex = 0.0; etot = blockdb.entryNum()
+            outx = 0; etot = blockdb.entryNum()
+            usecase = seqin.getBool('UseCase')
             prevseq = None
             fullseq = None
             seqname = None
             seqlen = 0
+            outfas = []     # Formatted fasta records, written to SEQOUT in batches of 1000
             for ekey in blockdb.dataKeys():
-                self.progLog('\r#BLOCK','Outputting NUMT blocks to {0}: {1:.1f}%'.format(seqout,ex/etot)); ex += 100.0
                 entry = blockdb.dict['Data'][ekey]
                 seq = seqdict[entry['SeqName']]
                 if seq != prevseq:
-                    (seqname,fullseq) = seqin.getSeq(seq,format='tuple')
+                    #i# Memory-mapped sequences are kept as raw bytes: only the NUMT block regions are decoded and uppercased
+                    if seqmap is not None: (seqname,fullseq) = mmapSeq(seqmap,seq,raw=True)
+                    else: (seqname,fullseq) = seqin.getSeq(seq,format='tuple')
                     prevseq = seq
                     seqlen = len(fullseq)
                 #i# New name
@@ -818,10 +1404,20 @@ class NUMTFinder(rje_obj.RJE_Object):
                 sname.insert(1,'(Pos %s - %s)' % (rje.iStr(entry['Start']),rje.iStr(entry['End'])))
                 sname = rje.join(sname)
                 sequence = fullseq[entry['Start']-1:entry['End']]
+                if seqmap is not None:
+                    sequence = sequence.decode('ascii')
+                    if not usecase: sequence = sequence.upper()
                 #X#(sname, sequence) = seqin.getSeqFrag(seq,fragstart=entry['Start'],fragend=entry['End'])
-                SEQOUT.write('>{0}\n{1}\n'.format(sname,sequence)); outx += 1
+                outfas.append('>{0}\n{1}\n'.format(sname,sequence)); outx += 1
+                #i# Progress is updated with each batch write rather than formatted for every block
+                if len(outfas) >= 1000:
+                    SEQOUT.write(''.join(outfas)); outfas = []
+                    self.progLog('\r#BLOCK','Outputting NUMT blocks to {0}: {1:.1f}%'.format(seqout,outx*100.0/etot))
+            SEQOUT.write(''.join(outfas))
             SEQOUT.close()
+            if seqmap is not None: seqmap.close()
             self.printLog('\r#BLOCK','Output {2} of {1} NUMT block sequences to {0}'.format(seqout,etot,outx))
+            self.savePhase('blockfas',fingerprint)
             return True
         except: self.errorLog('%s.blockFasta error' % self.prog()); return False
 #########################################################################################################################
@@ -832,43 +1428,52 @@ class NUMTFinder(rje_obj.RJE_Object):
         try:### ~ [1] Setup ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             samcmd = ['seqin={0}'.format(self.getStr('mtQuery')),'basefile={0}.numtfrag'.format(self.baseFile()),
                       'minreadlen={0}'.format(self.getInt('MinFragLen'))]
+            #i# SAMtools re-uses existing coverage and depth plot files if force=F, so these are forced if numtfrag has changed
+            fingerprint = self.phaseFingerprint('coverage')
+            if not self.force() and self.phaseChanged('coverage',fingerprint): samcmd.append('force=T')
             samdefault = ['depthsmooth=10','peaksmooth=0','depthplot=T','readlen=T']
+            import rje_samtools
             sam = rje_samtools.SAMtools(self.log,samdefault+self.cmd_list+samcmd)
             sam.obj['DB'] = self.obj['DB']
             mtlen = self.getInt('mtLen')
             seq = self.obj['mtDNA'].seqs()[0]
             ### ~ [2] Generate 'rid' table from numtfrag table ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-            fragdb = self.db('numtfrag')
-            riddb = self.db().copyTable(fragdb, 'rid')
+            #i# numtfrag is the in-memory table from numtProcess(): db() only returns a loaded table and never re-reads it.
+            #i# Rather than copying every numtfrag field and then reducing and renaming them, rid entries are made directly
+            #i# with just the rid fields, numbered from 1 in numtfrag key order. (An ID of 0 would be re-numbered by makeKey().)
             #i# ['RID','Locus','Start','End','RLen','MLen','Clip5','Clip3']
-            riddb.autoID()
-            riddb.newKey(['#'])
-            riddb.addField('Locus',evalue=self.obj['mtDNA'].shortName(seq))
-            riddb.renameField('Length', 'RLen')
-            riddb.setFields(['#','Locus','mtStart','mtEnd','RLen','Strand'])
-            riddb.renameField('mtStart', 'Start')
-            riddb.renameField('mtEnd', 'End')
+            fragdb = self.db('numtfrag')
+            if self.db().getTable('rid'): self.db().deleteTable('rid')
+            riddb = self.db().addEmptyTable('rid',['#','Locus','Start','End','RLen','Strand'],['#'])
+            locus = self.obj['mtDNA'].shortName(seq)
+            for (rx,fkey) in enumerate(fragdb.dataKeys(),1):
+                frag = fragdb.dict['Data'][fkey]
+                riddb.dict['Data'][rx] = {'#':rx,'Locus':locus,'Start':frag['mtStart'],'End':frag['mtEnd'],'RLen':frag['Length'],'Strand':frag['Strand']}
             riddb.dataFormat({'Start':'int','End':'int','#':'int','RLen':'int'})
             splitx = 0
-            nextid = 1
-            if riddb.entries():
-                nextid = max(riddb.dataList(riddb.entries(),'#')) + 1
+            #i# The next free ID is taken from the keys after dataFormat() has re-keyed the table: an entry with a '#' of
+            #i# 0 is re-numbered by makeKey() on re-keying, so the entry count is not necessarily free.
+            nextid = max(riddb.dataKeys() or [0]) + 1
             self.printLog('#SPLIT','Splitting fragments that span circularisation for depth plots')
-            for rentry in riddb.entries()[0:]:
+            splitentries = []   # New entries for the mtDNA end of split fragments, added once the loop is finished
+            for rentry in riddb.entries():
                 #i# Split hits that go off the end
                 if rentry['Start'] > rentry['End']:
                     #self.bugPrint(rentry)
-                    newentry = rje.combineDict({},rentry)
+                    newentry = rentry.copy()
                     newentry['End'] = mtlen
                     newentry['#'] = nextid
                     newentry['RLen'] = mtlen - newentry['Start'] + 1
                     rentry['RLen'] = rentry['End']
-                    riddb.addEntry(newentry)
+                    splitentries.append(newentry)
                     rentry['Start'] = 1
                     splitx += 1
                     nextid += 1
                     #self.bugPrint(newentry)
                     #self.deBug(rentry)
+            #i# New entries are full copies of existing rid entries, so are added directly rather than by addEntry()
+            for newentry in splitentries: riddb.dict['Data'][riddb.makeKey(newentry)] = newentry
+            if splitentries: riddb.dict['Index'] = {}
             self.printLog('#SPLIT','Split {0} NUMT fragments that span circularisation for depth plots'.format(splitx))
             riddb.renameField('#','RID')
             riddb.newKey(['RID'])
@@ -930,7 +1535,7 @@ class NUMTFinder(rje_obj.RJE_Object):
                     (sname,sequence) = mtdna.getSeqFrag(seq,fragstart=peak[0],fragend=peak[1])
                     open(peakfile,wmode).write('>{0}\n{1}\n'.format(sname,sequence))
                     self.printLog('\r#PEAK','Peak coverage region output to {0}.'.format(peakfile))
-
+            self.savePhase('coverage',fingerprint)
             return True
         except: self.errorLog('%s.coverageOutputs error' % self.prog()); return False
 #########################################################################################################################
@@ -942,6 +1547,79 @@ class NUMTFinder(rje_obj.RJE_Object):
 #########################################################################################################################
 ### SECTION III: MODULE METHODS                                                                                         #
 #########################################################################################################################
+def mmapSeq(seqmap,fpos,case=False,raw=False):   ### Returns (name,sequence) tuple for fasta record at fpos of memory-mapped file
+    '''
+    Returns (name,sequence) tuple for the fasta record at fpos of a memory-mapped sequence file. This matches
+    SeqList.getSeq(format='tuple') in file mode, without reading the sequence one line at a time.
+    >> seqmap:mmap = Memory-mapped fasta file (ACCESS_READ).
+    >> fpos:int = File position of the sequence name line (SeqList file mode sequence).
+    >> case:bool [False] = Whether to keep sequence case (else returns uppercase).
+    >> raw:bool [False] = Whether to return the sequence as undecoded bytes, with case unchanged.
+    << (name,sequence) tuple
+    '''
+    if seqmap[fpos:fpos+1] != b'>': raise ValueError('Given file position that is not fasta name line')
+    nameend = seqmap.find(b'\n',fpos)
+    if nameend < 0: nameend = len(seqmap)
+    seqend = seqmap.find(b'\n>',nameend)
+    if seqend < 0: seqend = len(seqmap)
+    name = rje.chomp(seqmap[fpos+1:nameend].decode('ascii'))
+    sequence = seqmap[nameend+1:seqend].replace(b'\n',b'').replace(b'\r',b'')
+    if raw: return (name,sequence)
+    sequence = sequence.decode('ascii')
+    if not case: sequence = sequence.upper()
+    return (name,sequence)
+#########################################################################################################################
+def fileFingerprint(filename,chunk=1048576,full=False):    ### Returns a size plus md5 fingerprint of a (large) file
+    '''
+    Returns a fingerprint of a (large) file: its size and the md5 hash of its first and last `chunk` bytes. This cheap
+    sampled fingerprint is used for the BLAST database stamp. With full=True, the whole file is hashed, read in `chunk`
+    byte blocks.
+    >> filename:str = File to fingerprint.
+    >> chunk:int [1048576] = Number of bytes from each end of the file to hash (or block size if full=True).
+    >> full:bool [False] = Whether to hash the full file rather than its ends.
+    << "size\tmd5" fingerprint string, or "None" if the file is missing
+    '''
+    if not rje.exists(filename): return 'None'
+    fsize = os.path.getsize(filename)
+    FILE = open(filename,'rb')
+    fhash = hashlib.md5(FILE.read(chunk))
+    if full:
+        block = FILE.read(chunk)
+        while block:
+            fhash.update(block)
+            block = FILE.read(chunk)
+    elif fsize > chunk:
+        FILE.seek(max(chunk,fsize-chunk))
+        fhash.update(FILE.read())
+    FILE.close()
+    return '{0}\t{1}'.format(fsize,fhash.hexdigest())
+#########################################################################################################################
+def blastSeqID(seqid,names):    ### Returns the sequence name for a BLAST+ tabular (-parse_seqids) sequence ID
+    '''
+    Returns the sequence name for a BLAST+ tabular sequence ID. With `makeblastdb -parse_seqids`, IDs can be reported with
+    an `lcl|` prefix or, for accession-like names, in FASTA-style `db|accession|` form (e.g. `ref|NC_000001.11|`).
+    As in rje_blast_V2, `lcl|` is stripped. Other IDs are reduced to their accession if that is a sequence name.
+    >> seqid:str = BLAST+ sequence ID (e.g. qseqid or sseqid).
+    >> names:set = Set of sequence (short) names in the searched file.
+    << sequence name (or the unmodified seqid if no match)
+    '''
+    if seqid in names: return seqid
+    if seqid.startswith('lcl|') and seqid[4:] in names: return seqid[4:]
+    for part in seqid.split('|')[1:]:
+        if part in names: return part
+    if seqid.startswith('lcl|'): return seqid[4:]
+    return seqid
+#########################################################################################################################
+def cpuCount():     ### Returns the number of CPUs available (1 if unknown)
+    '''
+    Returns the number of CPUs available, or 1 if this cannot be determined.
+    << cpux:int
+    '''
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except: return 1
+#########################################################################################################################
 
 #########################################################################################################################
 ### END OF SECTION III                                                                                                  #
@@ -19,8 +19,8 @@
 """
 Module:       rje
 Description:  Contains SLiMSuite and Sequite General Objects
-Version:      4.25.0
-Last Edit:    07/08/24
+Version:      4.25.3
+Last Edit:    14/10/26
 Copyright (C) 2005  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -181,6 +181,9 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 4.24.2 - Fixed md5 hash bug.
     # 4.24.3 - Py3 urllib bug fix. / to // bug fixes.
     # 4.25.0 - Added fullforce=T/F to default options to regenerate externally created data rather than keep existing data results [False]
+    # 4.25.1 - Streamlined dataDict() line reading and readDelimit() for lines without quotes.
+    # 4.25.2 - Added first-character short-circuit of dataDict() ignore line checks.
+    # 4.25.3 - dataDict() builds each line's field dictionary with zip() rather than a per-field try/except loop.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -4253,6 +4256,7 @@ def readDelimit(line='',delimit='\t'):  ### Returns list of strings from file li
     if not line: return []
     if delimit in [' ','\s+']: splitlist = line.split()
     else: splitlist = line.split(delimit)
+    if '"' not in line: return splitlist    # No quoted fields to recombine
     readlist = []
     s = 0
     while s < len(splitlist):
@@ -4386,24 +4390,22 @@ def dataDict(callobj,filename,mainkeys=[],datakeys=[],delimit=None,headers=[],ge
                     raise ValueError
         
         ### ~ Read data from file into dictionary ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
-        fline = FILE.readline(); ix = 0
-        while fline:
+        #i# Iterate over the file handle rather than calling readline() for every line
+        #i# Only lines starting with the first character of an ignore string need the full ignoreLine() check
+        if ignore and '' not in ignore: ignorefirst = set([i[:1] for i in ignore])
+        else: ignorefirst = None
+        ix = 0
+        for fline in FILE:
             if debug: callobj.deBug(datadict); callobj.bugPrint(fline)
             try:
                 #x#callobj.deBug('%s -> %d' % (fline,len(datadict)))
                 ## Check whether line is to be ignored ##
-                if ignoreLine(fline,ignore):
-                    fline = FILE.readline()
-                    continue
+                if ignore and (ignorefirst is None or fline[:1] in ignorefirst) and ignoreLine(fline,ignore): continue
                 ## Convert to data list and check for headers ##
                 data = readDelimit(fline,delimit)
-                if (len(data) != len(headers) and enforce) or len(data) < keylen:
-                    fline = FILE.readline()
-                    continue
-                linedata = {}
-                for h in range(len(headers)):
-                    try: linedata[headers[h]] = data[h]
-                    except: linedata[headers[h]] = ''
+                if (len(data) != len(headers) and enforce) or len(data) < keylen: continue
+                if len(data) < len(headers): data += [''] * (len(headers) - len(data))
+                linedata = dict(zip(headers,data))
                 ## Main Key ##
                 ix += 1
                 #callobj.deBug('%s -> %s (%d)' % (mainkeys,autoid,ix))
@@ -4411,7 +4413,7 @@ def dataDict(callobj,filename,mainkeys=[],datakeys=[],delimit=None,headers=[],ge
                 else:
                     mainkey = []
                     for key in mainkeys: mainkey.append(linedata[key])
-                    if not ''.join(mainkey): fline = FILE.readline(); continue
+                    if not ''.join(mainkey): continue
                     mainkey = delimit.join(mainkey)
                 if debug: callobj.deBug('...%s' % datadict)
                 if mainkey not in datadict: datadict[mainkey] = {}
@@ -4426,7 +4428,6 @@ def dataDict(callobj,filename,mainkeys=[],datakeys=[],delimit=None,headers=[],ge
                         if key not in datadict[mainkey]: datadict[mainkey][key] = []
                         if linedata[key] and linedata[key] not in datadict[mainkey][key]: datadict[mainkey][key].append(linedata[key])
                     else: datadict[mainkey][key] = linedata[key]
-                fline = FILE.readline()
             except:
                 callobj.deBug(fline); raise
         if debug: callobj.deBug(datadict)
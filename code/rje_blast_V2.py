@@ -19,8 +19,8 @@
 """
 Module:       rje_blast
 Description:  BLAST+ Control Module
-Version:      2.27.0
-Last Edit:    02/03/21
+Version:      2.27.3
+Last Edit:    14/10/26
 Copyright (C) 2013  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -143,6 +143,9 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 2.26.0 - Initial Python3 code conversion.
     # 2.26.1 - Tweaked to handle BLAST v5 formatting.
     # 2.27.0 - Modified to handle NCBI nr without main fasta file.
+    # 2.27.1 - saveSAM() tracks primary alignment names in a set rather than a list.
+    # 2.27.2 - saveGFF() joins each local hit's attributes once rather than by repeated string concatenation.
+    # 2.27.3 - reduceLocal() processes each Hit's local alignments separately, so overlap scans skip other Hits.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -178,7 +181,7 @@ def todo():     ### Major Functionality to Add - only a method for PythonWin col
 #########################################################################################################################
 def makeInfo(): ### Makes Info object which stores program details, mainly for initial print to screen.
     '''Makes Info object which stores program details, mainly for initial print to screen.'''
-    (program, version, last_edit, cyear) = ('RJE_BLAST', '2.27.0', 'March 2021', '2013')
+    (program, version, last_edit, cyear) = ('RJE_BLAST', '2.27.3', 'October 2026', '2013')
     description = 'BLAST+ Control Module'
     author = 'Dr Richard J. Edwards.'
     comments = ['Please report any unexpected behaviour.']
@@ -1568,6 +1571,8 @@ class BLASTRun(rje_obj.RJE_Object):
             hitseqlist = rje_seqlist.SeqList(self.log,self.cmd_list+['seqin=%s' % self.getStr('DBase'),'autoload=T','autofilter=F','mode=file'])
             hitseqdict = hitseqlist.makeSeqNameDic('short')
             ## ~ [3a] Output individual query files ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+            #i# Files are written serially: each query file is built in memory and saved with one saveSeq() call, so the
+            #i# time is in reading hit sequences and formatting fragments (CPU-bound under the GIL), not in file writes.
             if byquery:
                 fasx = 0; qtot = len(qryfrag)
                 for qry in rje.sortKeys(qryfrag):
@@ -2040,63 +2045,68 @@ class BLASTRun(rje_obj.RJE_Object):
             mx = btot - bdb.entryNum()
             ### ~ [1] Cycle through local alignments, reducing as required ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             bentries = bdb.sortedEntries(sortfield,reverse=sortfield in ['Identity','Positives','Length','BitScore'])   # List of all entries (sorted) to process
+            #i# Hits are reduced independently of each other, so split the sorted entries by Hit (retaining order).
+            #i# This restricts the overlap scan in [1c] to other alignments against the same Hit.
+            hitentries = {}
+            for entry in bentries:
+                if entry['Hit'] not in hitentries: hitentries[entry['Hit']] = []
+                hitentries[entry['Hit']].append(entry)
+            rx = len(bentries)      # Number of remaining entries to process (for progress)
             alignpos = {}; ax = 0   # Dictionary of {Hit:[(start,stop) list of positions included in local aln]}
-            while bentries:
-                ## ~ [1a] Grab next best remaining hit from bentries ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-                entry = bentries.pop(0)     # This is best remaining hit
-                #self.debug('QrySeq: %d; AlnSeq: %d; SbjSeq: %d' % (len(entry['QrySeq']),len(entry['AlnSeq']),len(entry['SbjSeq'])))
-                ax += 1
-                self.progLog('\r#LOCALN','Processing local alignments: %s -> %s' % (rje.iLen(bentries),rje.iStr(ax)))
-                hit = entry['Hit']
-                region = (min(entry['SbjStart'],entry['SbjEnd']),max(entry['SbjStart'],entry['SbjEnd']))
-                ## ~ [1b] Update alignpos dictionary ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-                if hit not in alignpos: alignpos[hit] = []
-                alignpos[hit].append(region)
-                alignpos[hit] = rje.collapseTupleList(alignpos[hit])
-                ## ~ [1c] Adjust/Filter remaining entries ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
-                ex = 0
-                while ex < len(bentries):
-                    xentry = bentries[ex]
-                    yentry = None   # Will be created if splitting
-                    # Skip if different Hit
-                    if entry['Hit'] != xentry['Hit']: ex += 1; continue
-                    # Check for overlapping regions and remove
-                    xregion = (min(xentry['SbjStart'],xentry['SbjEnd']),max(xentry['SbjStart'],xentry['SbjEnd']))
-                    # No overlap
-                    if xregion[1] < region[0] or xregion[0] > region[1]: ex += 1; continue
-                    # Completely overlapped: remove
-                    elif xregion[0] >= region[0] and xregion[1] <= region[1]:
-                        bdb.dropEntry(xentry)
-                        bentries.pop(ex)
-                        continue
-                    # Middle covered: split
-                    elif region[0] > xregion[0] and region[1] < xregion[1]:
-                        self.bugPrint('\nEntry splitting: %s vs %s' % (xregion,region))
-                        xalnx = max(bdb.indexDataList('Hit',hit,'AlnID'))
-                        yentry = rje.combineDict({'AlnID':xalnx+1},xentry,overwrite=False)
-                        self.printLog('#ALNID','%s vs %s Aln %d -> %d & %d' % (xentry['Query'],xentry['Hit'],xentry['AlnID'],xentry['AlnID'],yentry['AlnID']))
-                        #self.bugPrint(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},xentry,overwrite=False,replaceblanks=False))
-                        self.trimLocal(xentry,trimend='End',trimto=region[0],sortends=True)   # Trim the end back to region[0]
-                        #self.debug(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},xentry,overwrite=False,replaceblanks=False))
-                        #self.bugPrint(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},yentry,overwrite=False,replaceblanks=False))
-                        self.trimLocal(yentry,trimend='Start',trimto=region[1],sortends=True)   # Trim the start back to region[1]
-                        #self.debug(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},yentry,overwrite=False,replaceblanks=False))
-                    # Overlap at one end
-                    elif region[0] <= xregion[1] <= region[1]:  # End overlaps with focal entry
-                        #self.bugPrint('\nEnd overlap: %s vs %s' % (xregion,region))
-                        self.trimLocal(xentry,trimend='End',trimto=region[0],sortends=True)   # Trim the end back to region[0]
-                    elif region[0] <= xregion[0] <= region[1]:  # Start overlaps with focal entry
-                        #self.bugPrint('\nStart overlap: %s vs %s' % (xregion,region))
-                        self.trimLocal(xentry,trimend='Start',trimto=region[1],sortends=True)   # Trim the start back to region[1]
-                    else: raise ValueError('Entry filtering has gone wrong: %s vs %s' % (xregion,region))
-                    ## Check lengths
-                    if xentry['Length'] >= minloclen: ex += 1
-                    else: bdb.dropEntry(xentry); bentries.pop(ex); mx += 1
-                    if yentry and yentry['Length'] >= minloclen:
-                        bdb.addEntry(yentry)
-                        bentries.insert(ex,yentry)
-                        ex += 1
-                    elif yentry: mx += 1
+            for hit in rje.sortKeys(hitentries):
+                bentries = hitentries.pop(hit)
+                while bentries:
+                    ## ~ [1a] Grab next best remaining hit from bentries ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+                    entry = bentries.pop(0)     # This is best remaining hit
+                    ax += 1; rx -= 1
+                    self.progLog('\r#LOCALN','Processing local alignments: %s -> %s' % (rje.iStr(rx),rje.iStr(ax)))
+                    region = (min(entry['SbjStart'],entry['SbjEnd']),max(entry['SbjStart'],entry['SbjEnd']))
+                    ## ~ [1b] Update alignpos dictionary ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+                    if hit not in alignpos: alignpos[hit] = []
+                    alignpos[hit].append(region)
+                    alignpos[hit] = rje.collapseTupleList(alignpos[hit])
+                    ## ~ [1c] Adjust/Filter remaining entries ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ##
+                    ex = 0
+                    while ex < len(bentries):
+                        xentry = bentries[ex]
+                        yentry = None   # Will be created if splitting
+                        # Check for overlapping regions and remove
+                        xregion = (min(xentry['SbjStart'],xentry['SbjEnd']),max(xentry['SbjStart'],xentry['SbjEnd']))
+                        # No overlap
+                        if xregion[1] < region[0] or xregion[0] > region[1]: ex += 1; continue
+                        # Completely overlapped: remove
+                        elif xregion[0] >= region[0] and xregion[1] <= region[1]:
+                            bdb.dropEntry(xentry)
+                            bentries.pop(ex); rx -= 1
+                            continue
+                        # Middle covered: split
+                        elif region[0] > xregion[0] and region[1] < xregion[1]:
+                            self.bugPrint('\nEntry splitting: %s vs %s' % (xregion,region))
+                            xalnx = max(bdb.indexDataList('Hit',hit,'AlnID'))
+                            yentry = rje.combineDict({'AlnID':xalnx+1},xentry,overwrite=False)
+                            self.printLog('#ALNID','%s vs %s Aln %d -> %d & %d' % (xentry['Query'],xentry['Hit'],xentry['AlnID'],xentry['AlnID'],yentry['AlnID']))
+                            #self.bugPrint(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},xentry,overwrite=False,replaceblanks=False))
+                            self.trimLocal(xentry,trimend='End',trimto=region[0],sortends=True)   # Trim the end back to region[0]
+                            #self.debug(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},xentry,overwrite=False,replaceblanks=False))
+                            #self.bugPrint(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},yentry,overwrite=False,replaceblanks=False))
+                            self.trimLocal(yentry,trimend='Start',trimto=region[1],sortends=True)   # Trim the start back to region[1]
+                            #self.debug(rje.combineDict({'QrySeq':'','SbjSeq':'','AlnSeq':''},yentry,overwrite=False,replaceblanks=False))
+                        # Overlap at one end
+                        elif region[0] <= xregion[1] <= region[1]:  # End overlaps with focal entry
+                            #self.bugPrint('\nEnd overlap: %s vs %s' % (xregion,region))
+                            self.trimLocal(xentry,trimend='End',trimto=region[0],sortends=True)   # Trim the end back to region[0]
+                        elif region[0] <= xregion[0] <= region[1]:  # Start overlaps with focal entry
+                            #self.bugPrint('\nStart overlap: %s vs %s' % (xregion,region))
+                            self.trimLocal(xentry,trimend='Start',trimto=region[1],sortends=True)   # Trim the start back to region[1]
+                        else: raise ValueError('Entry filtering has gone wrong: %s vs %s' % (xregion,region))
+                        ## Check lengths
+                        if xentry['Length'] >= minloclen: ex += 1
+                        else: bdb.dropEntry(xentry); bentries.pop(ex); mx += 1; rx -= 1
+                        if yentry and yentry['Length'] >= minloclen:
+                            bdb.addEntry(yentry)
+                            bentries.insert(ex,yentry); rx += 1
+                            ex += 1
+                        elif yentry: mx += 1
             ### ~ [2] Check and finish ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             self.printLog('\r#LOCALN','Processing local alignments: %s -> %s (%s failed to meet minloclen=%d)' % (rje.iStr(btot),rje.iStr(ax),rje.iStr(mx),minloclen))
             if ax != bdb.entryNum(): raise ValueError('EntryNum mismatch following reduceLocal(): %s best entries but %s local alignments' % (ax,bdb.entryNum()))
@@ -2412,22 +2422,18 @@ class BLASTRun(rje_obj.RJE_Object):
                 #i# Could make a better ID?
                 entry['ID'] = '%s:aln' % entry[qrytype]
                 entry['Name'] = '%s.%s-%s' % (entry[qrytype],rje.preZero(entry['%sStart' % qrytype],qlen),rje.preZero(entry['%sEnd' % qrytype],qlen))
-                # Add notes
-                for field in ['ID','Name']:
-                    entry['attributes'] += '%s=%s;' % (field,entry[field])
-                if cdsmode: entry['attributes'] += 'Parent=%s;' % entry[qrytype]
-                for field in ['BitScore','Expect','Length','Identity','AlnID']:
-                    entry['attributes'] += '%s=%s;' % (field.lower(),entry[field])
-                entry['attributes'] += 'qstart=%s;' % min(entry['%sStart' % qrytype],entry['%sEnd' % qrytype])
-                entry['attributes'] += 'qend=%s;' % max(entry['%sStart' % qrytype],entry['%sEnd' % qrytype])
-                if entry['SeqLen']:
-                    field = 'SeqLen'
-                    entry['attributes'] += '%s=%s;' % (field.lower(),entry[field])
+                # Add notes: attributes are collected as a list and joined once per entry
+                attlist = ['%s=%s' % (field,entry[field]) for field in ['ID','Name']]
+                if cdsmode: attlist.append('Parent=%s' % entry[qrytype])
+                attlist += ['%s=%s' % (field.lower(),entry[field]) for field in ['BitScore','Expect','Length','Identity','AlnID']]
+                attlist.append('qstart=%s' % min(entry['%sStart' % qrytype],entry['%sEnd' % qrytype]))
+                attlist.append('qend=%s' % max(entry['%sStart' % qrytype],entry['%sEnd' % qrytype]))
+                if entry['SeqLen']: attlist.append('seqlen=%s' % entry['SeqLen'])
                 if cdsmode:
                     astart = min(entry['%sStart' % qrytype],entry['%sEnd' % qrytype])
                     if self.getStr('Type') != 'tblastn':
                         entry['phase'] = (astart - 1) % 3
-                entry['attributes'] = entry['attributes'][:-1]
+                entry['attributes'] = ';'.join(attlist)
                 self.debug(entry)
                 qh = (entry['Qry'],entry['Hit'])
                 if qh in fullgff:
@@ -2541,7 +2547,7 @@ class BLASTRun(rje_obj.RJE_Object):
             samdb.addField('SEQ',evalue='*')
             samdb.addField('QUAL',evalue='*')
             samdb.addField('NOTES',evalue='al:Z:')
-            qlist = []
+            qlist = set()   # Set of QNAME already output as a primary alignment
             for entry in samdb.sortedEntries('Identity',reverse=True):
                 #self.bugPrint(entry)
                 revhit = entry['HitStart'] > entry['HitEnd']
@@ -2551,7 +2557,7 @@ class BLASTRun(rje_obj.RJE_Object):
                 #!# Check lengths from other table(s) and only add start/end if not full length
                 if revhit and reftype == 'Hit': qname = '%s.%s-%s' % (entry[qrytype],rje.preZero(entry['%sEnd' % qrytype],qlen),rje.preZero(entry['%sStart' % qrytype],qlen))
                 else: qname = '%s.%s-%s' % (entry[qrytype],rje.preZero(entry['%sStart' % qrytype],qlen),rje.preZero(entry['%sEnd' % qrytype],qlen))
-                if qname not in qlist: qlist.append(qname); entry['FLAG'] = 0
+                if qname not in qlist: qlist.add(qname); entry['FLAG'] = 0
                 entry['QNAME'] = qname
 
                 if revhit: entry['FLAG'] += 16     # Reverse complement sequence
@@ -19,8 +19,8 @@
 """
 Module:       rje_db
 Description:  R Edwards Relational Database module
-Version:      1.10.2
-Last Edit:    21/08/23
+Version:      1.11.1
+Last Edit:    14/10/26
 Copyright (C) 2007  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -86,6 +86,10 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 1.10.0 - Initial Python3 code conversion.
     # 1.10.1 - Py3 bug fixing.
     # 1.10.2 - Updated to deal with lowercase dictionary entries for CamelCase fields.
+    # 1.10.3 - saveToFile() writes formatted lines in batches and only updates progress per batch.
+    # 1.10.4 - dataFormat() works out field data types once per call rather than per entry.
+    # 1.11.0 - Added renameFields() to rename several fields with a single pass through the data.
+    # 1.11.1 - Added buffering=INT to saveToFile(), with a 1 MiB default output buffer.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -104,7 +108,7 @@ def todo():     ### Major Functionality to Add - only a method for PythonWin col
 #########################################################################################################################
 def makeInfo():     ### Makes Info object
     '''Makes rje.Info object for program.'''
-    (program, version, last_edit, copy_right) = ('RJE_DB', '1.10.2', 'August 2023', '2008')
+    (program, version, last_edit, copy_right) = ('RJE_DB', '1.11.1', 'October 2026', '2008')
     description = 'R Edwards Relational Database module'
     author = 'Dr Richard J. Edwards.'
     comments = ['Please report bugs to Richard.Edwards@UNSW.edu.au']
@@ -1211,10 +1215,10 @@ class Table(rje.RJE_Object):
             return filename
         except: self.errorLog('Problem generating table "%s" filename' % (self.info['Name']))
 #########################################################################################################################
-    def saveTable(self,filename=None,delimit=None,backup=True,append=False,savekeys=[],savefields=[],sfdict={},log=True,headers=True,comments=[],buglog=False):    ### Saves data to delimited file
-        return self.saveToFile(filename,delimit,backup,append,savekeys,savefields,sfdict,log,headers,comments,buglog)
+    def saveTable(self,filename=None,delimit=None,backup=True,append=False,savekeys=[],savefields=[],sfdict={},log=True,headers=True,comments=[],buglog=False,buffering=1048576):    ### Saves data to delimited file
+        return self.saveToFile(filename,delimit,backup,append,savekeys,savefields,sfdict,log,headers,comments,buglog,buffering)
 #########################################################################################################################
-    def saveToFile(self,filename=None,delimit=None,backup=True,append=False,savekeys=[],savefields=[],sfdict={},log=True,headers=True,comments=[],buglog=False):    ### Saves data to delimited file
+    def saveToFile(self,filename=None,delimit=None,backup=True,append=False,savekeys=[],savefields=[],sfdict={},log=True,headers=True,comments=[],buglog=False,buffering=1048576):    ### Saves data to delimited file
         '''
         Saves data to delimited file.
         >> filename:str [None] = Output file name (will use self.info['Name'] if None)
@@ -1228,6 +1232,7 @@ class Table(rje.RJE_Object):
         >> headers:bool [True] = Whether to output the field headers.
         >> comments:list [] = Add a list of comment lines to the start of the file if not appending. Should usually start with #.
         >> buglog:bool [False] = Special debugging output to log.
+        >> buffering:int [1048576] = Output file buffer size in bytes, so that large tables are written in fewer system calls.
         '''
         try:### ~ [1] Setup parameters ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             if filename and not delimit: delimit = rje.delimitFromExt(filename=filename,write=True)
@@ -1246,10 +1251,10 @@ class Table(rje.RJE_Object):
                 if '*' in sfdict and '*' not in self.fields() and field not in sfdict: sfdict[field] = sfdict['*']
             ### ~ [2] Save to file ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             if log: self.progLog('\r#SAVE','Saving table "%s"...' % (self.info['Name']))
-            if append and rje.exists(filename): OUT = open(filename,'a')
+            if append and rje.exists(filename): OUT = open(filename,'a',buffering)
             else:
                 append = False
-                OUT = open(filename,'w')
+                OUT = open(filename,'w',buffering)
                 if comments:
                     hashwarn = 0
                     for comment in comments:
@@ -1262,10 +1267,10 @@ class Table(rje.RJE_Object):
                 outlist = []
                 for field in savefields: outlist.append('%s' % field)
                 if headers: OUT.write('%s\n' % rje.join(outlist,delimit))
-            (p,px) = (0.0,len(outkeys))
+            px = len(outkeys)
             sx = 0
+            outlines = []   # Formatted lines, written to OUT in batches of 10000
             for key in outkeys:
-                if log: self.progLog('\r#SAVE','Saving table "%s": %.1f%%' % (self.info['Name'],p/px)); p += 100.0
                 entry = self.dict['Data'][key]
                 outlist = []
                 for field in savefields:
@@ -1279,7 +1284,11 @@ class Table(rje.RJE_Object):
                         outlist[-1].replace('"','\"')
                         outlist[-1] = '"%s"' % outlist[-1]
                 if self.debugging() and buglog: self.printLog('#BUGOUT',rje.join(outlist,delimit))
-                OUT.write('%s\n' % rje.join(outlist,delimit)); sx += 1
+                outlines.append('%s\n' % rje.join(outlist,delimit)); sx += 1
+                if len(outlines) >= 10000:
+                    OUT.write(''.join(outlines)); outlines = []
+                    if log: self.progLog('\r#SAVE','Saving table "%s": %.1f%%' % (self.info['Name'],sx*100.0/px))
+            OUT.write(''.join(outlines))
             OUT.close()
             if log:
                 if sx and append: self.printLog('\r#SAVE','Table "%s" appended to "%s": %s entries.' % (self.info['Name'],filename,rje.iStr(sx)))
@@ -1447,6 +1456,42 @@ class Table(rje.RJE_Object):
             #try: self.deBug(entry)
             #except: pass
             return self.log.errorLog('Problem renaming "%s" field "%s"' % (self.info['Name'],field))
+#########################################################################################################################
+    def renameFields(self,renames,log=True):    ### Renames several fields in table with a single pass through the data
+        '''
+        Renames several fields in table with a single pass through the data (and a single re-keying if needed).
+        Fields are renamed simultaneously, so {'A':'B','B':'A'} will swap two fields.
+        >> renames:dict = Dictionary of {field:newname}
+        >> log:bool [True] = Whether to log renaming (in debug mode)
+        '''
+        try:### ~ [1] Change fields in table attributes ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            renames = dict([(field,renames[field]) for field in renames if field != renames[field]])
+            if not renames: return
+            for field in renames:
+                if field not in self.list['Fields']: self.errorLog('Cannot find %s in %s fields' % (field,self.name())); raise ValueError
+            self.list['Fields'] = [renames.get(field,field) for field in self.list['Fields']]
+            self.dict['Index'] = dict([(renames.get(field,field),self.dict['Index'][field]) for field in self.dict['Index']])
+            newkey = [field for field in self.list['Keys'] if field in renames] != []
+            self.list['Keys'] = [renames.get(field,field) for field in self.list['Keys']]
+            ### ~ [2] Change fields in table data ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
+            mx = 0
+            renamelist = list(renames.items())
+            for data in self.dict['Data'].values():
+                newdata = []
+                for (field,newname) in renamelist:
+                    try: newdata.append((newname,data.pop(field)))
+                    except: mx += 1
+                data.update(newdata)
+            if log: self.bugLog('#FIELD','%d fields renamed in table "%s" (%s field entries w/o data)' % (len(renames),self.info['Name'],rje.integerString(mx)))
+            if newkey:
+                newdata = {}
+                for oldkey in self.dataKeys():
+                    entry = self.dict['Data'].pop(oldkey)
+                    newdata[self.makeKey(entry)] = entry
+                self.dict['Data'] = newdata
+                if log: self.bugLog('#Key','Key updated (fields renamed) in table "%s".' % (self.info['Name']))
+        except:
+            return self.log.errorLog('Problem renaming "%s" fields %s' % (self.info['Name'],rje.sortKeys(renames)))
 #########################################################################################################################
     def splitField(self,field,splitlist,split='|',replace=False):   ### Splits field into splitlist fields using split character
         '''
@@ -1997,28 +2042,32 @@ class Table(rje.RJE_Object):
             for field in reformat:
                 self.dict['DataTypes'][field] = reformat[field].lower()
                 if field in self.keys(): rekey = True
+            #i# Field data type prefixes are sliced once here rather than for every field of every entry
+            ftypes = [(field,self.dict['DataTypes'][field][:3],self.dict['DataTypes'][field][:4]) for field in self.dict['DataTypes']]
+            blanks = {'str':'','int':0,'num':0.0,'flo':0.0,'boo':False}
+            debug = self.debugging()
             ### ~ [2] Reformat ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ ###
             (ex,etot,fx) = (0.0,self.entryNum(),0)
             for oldkey in self.dataKeys():
-                entry = self.data()[oldkey]
-                self.bugProg('\r#FORMAT','Reformatting %s: %.2f%%' % (self.info['Name'],ex/etot)); ex += 100.0
-                for field in self.dict['DataTypes']:
+                entry = self.dict['Data'][oldkey]
+                if debug: self.bugProg('\r#FORMAT','Reformatting %s: %.2f%%' % (self.info['Name'],ex/etot)); ex += 100.0
+                for (field,ftype,ftype4) in ftypes:
                     if field not in entry: continue
                     try:
                         if entry[field] == '':
-                            if not skipblank: entry[field] = {'str':'','int':0,'num':0.0,'flo':0.0,'boo':False}[self.dict['DataTypes'][field][:3]]
-                            continue                            
-                        if self.dict['DataTypes'][field][:3] == 'str': entry[field] = str(entry[field])
-                        if self.dict['DataTypes'][field][:3] in ['int']:
+                            if not skipblank: entry[field] = blanks[ftype]
+                            continue
+                        if ftype == 'str': entry[field] = str(entry[field])
+                        if ftype == 'int':
                             try: entry[field] = int(entry[field])
                             except:
                                 entry[field] = int(float(entry[field]))
                                 if field not in intwarn:
                                     self.printLog('\r#FWARN','Integer field "%s" might have contained float values. ' % field)
                                     intwarn.append(field)
-                        if self.dict['DataTypes'][field][:3] in ['num','flo','est']: entry[field] = float(entry[field])
-                        if self.dict['DataTypes'][field][:4] == 'estr': entry[field] = rje.expectString(entry[field])
-                        if self.dict['DataTypes'][field][:4] == 'bool':
+                        if ftype in ['num','flo','est']: entry[field] = float(entry[field])
+                        if ftype4 == 'estr': entry[field] = rje.expectString(entry[field])
+                        if ftype4 == 'bool':
                             if entry[field]:
                                 if str(entry[field]).lower() in ['0','false','f','no','n']: entry[field] = False
                                 else: entry[field] = True
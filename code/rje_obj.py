@@ -19,8 +19,8 @@
 """
 Module:       rje_obj
 Description:  Contains revised General Object templates for Rich Edwards scripts and bioinformatics programs
-Version:      2.11.1
-Last Edit:    18/09/24
+Version:      2.11.3
+Last Edit:    14/10/26
 Copyright (C) 2011  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -130,6 +130,8 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 2.10.0- Added compressionScore() function
     # 2.11.0- Added fullforce as a general option for controlling regeneration of externally created data.
     # 2.11.1- Fixed an issue with false reporting of programs in checkForProgram(). Updated verbosity to use sys.stdout.
+    # 2.11.2- Streamlined _cmdReadList() to only call _cmdRead() for matching attributes.
+    # 2.11.3- Moved the _cmdReadList() base* type check out of the attribute loop.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -567,9 +569,15 @@ class RJE_Object(object):     ### Metaclass for inheritance by other classes
         >> type:str = type of attribute (info,path,opt,int,float,min,max,list,clist,glist,file)
         >> att:list of attributes (key of dictionary) where commandline argument is att.lower()  []
         '''
+        #i# Parse the commandline argument once and only call _cmdRead() for the matching attribute(s)
+        cmdarg = cmd.split('=')[0].lower()
+        if cmdarg[:1] == '-': cmdarg = cmdarg[1:]
+        if type.startswith('base'):
+            if cmdarg == 'basefile':
+                for att in attlist: self._cmdRead(cmd,type[4:],att,'basefile')
+            return
         for att in attlist:
-            if type.startswith('base'): self._cmdRead(cmd,type[4:],att,'basefile')
-            else: self._cmdRead(cmd,type,att)
+            if cmdarg == att.lower(): self._cmdRead(cmd,type,att)
 #########################################################################################################################
     def _cmdRead(self,cmd=None,type='str',att=None,arg=None):     ### Sets self.type[att] from commandline command cmd
         '''
@@ -19,8 +19,8 @@
 """
 Module:       rje_samtools
 Description:  RJE SAMtools parser and processor
-Version:      1.21.1
-Last Edit:    29/04/22
+Version:      1.21.2
+Last Edit:    14/10/26
 Copyright (C) 2013  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -214,6 +214,7 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 1.20.3 - Fixed RLen bug.
     # 1.21.0 - Added readnames=T/F : Output the read names to the RID file (SAM parsing only) [False]
     # 1.21.1 - Fixed bug that is over-writing clip5 with clip3. Fixed readnames=T.
+    # 1.21.2 - Read depth plots accumulate read start/end changes rather than incrementing every read position.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -262,7 +263,7 @@ def todo():     ### Major Functionality to Add - only a method for PythonWin col
 #########################################################################################################################
 def makeInfo(): ### Makes Info object which stores program details, mainly for initial print to screen.
     '''Makes Info object which stores program details, mainly for initial print to screen.'''
-    (program, version, last_edit, copyyear) = ('rje_samtools', '1.21.1', 'April 2022', '2013')
+    (program, version, last_edit, copyyear) = ('rje_samtools', '1.21.2', 'October 2026', '2013')
     description = 'RJE SAMtools parser and processor'
     author = 'Dr Richard J. Edwards.'
     comments = ['This program is still in development and has not been published.',rje_zen.Zen().wisdom()]
@@ -2081,6 +2082,8 @@ class SAMtools(rje_obj.RJE_Object):
                 else: centry['Length'] = max(rdb.indexDataList('Locus',locus,'End',sortunique=False))
                 #self.debug('%s: %s (%s)' % (locus,centry['Length'],type(centry['Length'])))
                 if depthplot: depth[locus] = [0] * centry['Length']
+                #i# Read depth is accumulated as +1/-1 changes at read starts and ends, then summed over the locus once
+                if depthplot and not readlen: depdiff = [0] * (centry['Length'] + 1)
                 dirpos = [] # DirnLen assay points
                 if dirdb:
                     di = 0; dirpos = [1]
@@ -2147,10 +2150,16 @@ class SAMtools(rje_obj.RJE_Object):
                     #!# Job for another day!
                     #!# NOTE: Updating like this would make the readlen=TRUE calculations harder!
                     rlen = rje.dp(rlen/1000.0,1)    # Convert read length to kb (1 d.p.)
-                    if depthplot:
-                        for i in range(rentry['Start']-1,rentry['End']):
-                            if readlen: depth[locus][i] = max(depth[locus][i],rlen)
-                            else: depth[locus][i] += 1
+                    if depthplot and readlen:
+                        for i in range(rentry['Start']-1,rentry['End']): depth[locus][i] = max(depth[locus][i],rlen)
+                    elif depthplot and rentry['End'] >= rentry['Start']:
+                        depdiff[rentry['Start']-1] += 1
+                        depdiff[rentry['End']] -= 1
+                if depthplot and not readlen:
+                    x = 0
+                    for i in range(centry['Length']):
+                        x += depdiff[i]
+                        depth[locus][i] = x
                 if readlen:
                     centry['MeanX'] = sum(depth[locus]) / centry['Length']
                 else:
@@ -19,8 +19,8 @@
 """
 Module:       rje_seqlist
 Description:  RJE Nucleotide and Protein Sequence List Object (Revised)
-Version:      1.51.0
-Last Edit:    03/09/24
+Version:      1.51.1
+Last Edit:    14/10/26
 Copyright (C) 2011  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -267,6 +267,7 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 1.50.3 - Added bug that was leaving out last fastq sequence from summarise etc.
     # 1.50.4 - Added gensize=NUM alias for genomesize=NUM
     # 1.51.0 - Added chromlen=INT : Minimum length of a scaffold to count as a chromosome [0]
+    # 1.51.1 - shortName() and getSeq(format='short') no longer read the whole sequence in file mode.
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -296,7 +297,7 @@ def todo():     ### Major Functionality to Add - only a method for PythonWin col
 #########################################################################################################################
 def makeInfo(): ### Makes Info object which stores program details, mainly for initial print to screen.
     '''Makes Info object which stores program details, mainly for initial print to screen.'''
-    (program, version, last_edit, copy_right) = ('SeqList', '1.51.0', 'September 2024', '2011')
+    (program, version, last_edit, copy_right) = ('SeqList', '1.51.1', 'October 2026', '2011')
     description = 'RJE Nucleotide and Protein Sequence List Object (Revised)'
     author = 'Dr Richard J. Edwards.'
     comments = ['This program is still in development and has not been published.',rje_zen.Zen().wisdom()]
@@ -757,7 +758,7 @@ class SeqList(rje_obj.RJE_Object):
     def shortName(self,seq=None):    ### Returns short name (first word) of given sequence
         '''Returns short name (first word) of given sequence.'''
         if seq == None: seq = self.obj['Current']
-        return rje.split(self.getSeq(seq,'tuple')[0])[0]
+        return self.getSeq(seq,'short')
 #########################################################################################################################
     def seqLen(self,seq=None):       ### Returns length of given sequence
         '''Returns length of given sequence.'''
@@ -873,6 +874,8 @@ class SeqList(rje_obj.RJE_Object):
                 SEQFILE = self.SEQFILE()
                 SEQFILE.seek(seq)
                 name = rje.chomp(SEQFILE.readline())
+                #i# Short names only need the first word of the name line: do not read in the sequence
+                if format == 'short' and name[:1] in ['>','@']: return rje.split(name[1:],maxsplit=1)[0]
                 quality = ''
                 if name[:1] == '@': # FASTQ
                     name = name[1:]
@@ -7,8 +7,8 @@
 """
 Module:       rje_sequence
 Description:  DNA/Protein sequence object
-Version:      2.7.1
-Last Edit:    25/06/19
+Version:      2.7.3
+Last Edit:    14/10/26
 Copyright (C) 2006  Richard J. Edwards - See source code for GNU License Notice
 
 Function:
@@ -65,6 +65,8 @@ def history():  ### Program History - only a method for PythonWin collapsing! ##
     # 2.6.0 - Added mutation dictionary to Ks calculation.
     # 2.7.0 - Added shift=X to maskRegion() for 1-L input. Fixed cterminal maskRegion.
     # 2.7.1 - Added spCode() to sequence.
+    # 2.7.2 - Replaced reverseComplement() replace() passes with a single translate().
+    # 2.7.3 - Replaced complement() replace() passes with a single translate().
     '''
 #########################################################################################################################
 def todo():     ### Major Functionality to Add - only a method for PythonWin collapsing! ###
@@ -1551,40 +1553,15 @@ def kSDict(callobj=None,mutdict={}):   ### Returns the Ks frequency for each cod
     return ksdict
 #########################################################################################################################
 def complement(dnaseq,rna=False):  ### Returns the complement of the DNA sequence given (mixed case)
-    '''Returns the complement of the DNA sequence given.'''
-    revcomp = dnaseq
-    pairs = [('C','G'),('A','T')]
-    if rna: revcomp = rje.replace(revcomp,'U','T')
-    if rna: revcomp = rje.replace(revcomp,'u','t')
-    for (n1,n2) in pairs:
-        revcomp = rje.replace(revcomp,n1,'!')
-        revcomp = rje.replace(revcomp,n2,n1)
-        revcomp = rje.replace(revcomp,'!',n2)
-        n1 = n1.lower(); n2 = n2.lower()
-        revcomp = rje.replace(revcomp,n1,'!')
-        revcomp = rje.replace(revcomp,n2,n1)
-        revcomp = rje.replace(revcomp,'!',n2)
-    if rna: revcomp = rje.replace(revcomp,'T','U')
-    if rna: revcomp = rje.replace(revcomp,'t','u')
-    return revcomp
+    '''Returns the complement of the DNA sequence given. Uses the same single translate() table as reverseComplement().'''
+    return dnaseq.translate(revcompTable[rna])
+#########################################################################################################################
+try: revcompTable = {False:str.maketrans('ACGTacgt','TGCAtgca'), True:str.maketrans('ACGTUacgtu','UGCAAugcaa')}
+except AttributeError: revcompTable = {False:string.maketrans('ACGTacgt','TGCAtgca'), True:string.maketrans('ACGTUacgtu','UGCAAugcaa')}    # Python 2
 #########################################################################################################################
 def reverseComplement(dnaseq,rna=False):  ### Returns the reverse complement of the DNA sequence given (mixed case)
-    '''Returns the reverse complement of the DNA sequence given.'''
-    revcomp = rje.strReverse(dnaseq)
-    pairs = [('C','G'),('A','T')]
-    if rna: revcomp = rje.replace(revcomp,'U','T')
-    if rna: revcomp = rje.replace(revcomp,'u','t')
-    for (n1,n2) in pairs:
-        revcomp = rje.replace(revcomp,n1,'!')
-        revcomp = rje.replace(revcomp,n2,n1)
-        revcomp = rje.replace(revcomp,'!',n2)
-        n1 = n1.lower(); n2 = n2.lower()
-        revcomp = rje.replace(revcomp,n1,'!')
-        revcomp = rje.replace(revcomp,n2,n1)
-        revcomp = rje.replace(revcomp,'!',n2)
-    if rna: revcomp = rje.replace(revcomp,'T','U')
-    if rna: revcomp = rje.replace(revcomp,'t','u')
-    return revcomp
+    '''Returns the reverse complement of the DNA sequence given. Uses a single translate() pass of the reversed sequence.'''
+    return dnaseq[::-1].translate(revcompTable[rna])
 #########################################################################################################################
 def OLDreverseComplement(dnaseq,rna=False):  ### Returns the reverse complement of the DNA sequence given (upper case)
     '''Returns the reverse complement of the DNA sequence given.'''
@@ -0,0 +1,253 @@
+#!/usr/bin/python
+# Regression tests for NUMTFinder. Run from the repository root with: python -m unittest discover -s tests
+import os, random, shlex, shutil, sys, tempfile, unittest
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','code'))
+try: from unittest import mock
+except ImportError: import mock
+import rje, numtfinder
+
+MTLEN = 200
+UNIQUE = 'Query	Hit	AlnID	BitScore	Expect	Length	Identity	Positives	QryStart	QryEnd	SbjStart	SbjEnd'.split()
+#i# (QryStart,QryEnd,SbjStart,SbjEnd) hits to the 2X mtDNA query. The second spans the circularisation point.
+HITS = [(10,60,100,150),(180,230,500,550),(50,90,1000,1040)]
+
+class FakeSystem(object):   ### Replaces os.system(), recording BLAST+ commands and writing blastn tabular output
+    def __init__(self,fail=False,hitids=['chr1']):
+        self.commands = []
+        self.fail = fail        # Whether blastn fails without output
+        self.hitids = hitids    # BLAST+ sseqid values, cycled through for the hits
+    def __call__(self,command):
+        self.commands.append(command)
+        if command.split()[0].endswith('blastn'):
+            if self.fail: return 256
+            blast6 = command.split(' -out ')[1].split()[0]
+            OUT = open(blast6,'w')
+            for (i,(qstart,qend,sstart,send)) in enumerate(HITS):
+                hlen = qend - qstart + 1
+                OUT.write('{0}\n'.format('\t'.join(['{0}'.format(x) for x in ['mt2X',self.hitids[i % len(self.hitids)],2*hlen,1e-10,hlen,hlen,hlen,qstart,qend,sstart,send,'A'*hlen,'A'*hlen]])))
+            OUT.close()
+        return 0
+    def programs(self,program): return [command for command in self.commands if command.split()[0].endswith(program)]
+
+class FakeGABLAM(object):   ### Replaces gablam.GABLAM, recording commands and writing the unique hits table
+    runs = []
+    def __init__(self,log,cmd_list): self.cmd_list = cmd_list
+    def run(self):
+        FakeGABLAM.runs.append(self.cmd_list)
+        basefile = [cmd.split('=',1)[1] for cmd in self.cmd_list if cmd.startswith('basefile=')][-1]
+        writeUnique('{0}.unique.tdt'.format(basefile),HITS)
+    def force(self): return [cmd.lower().split('=',1)[1] for cmd in self.cmd_list if cmd.lower().startswith('force=')][-1:] == ['t']
+
+class FakeForker(object):   ### Replaces rje_forker.Forker.run(), writing chunk hit tables for chunk searches
+    def __init__(self,fail=[]):
+        self.forked = []        # List of ToFork command lists for each run
+        self.fail = fail        # List of chunk basefiles for which the chunk search fails
+    def __call__(self,forker):
+        self.forked.append(forker.list['ToFork'][0:])
+        for fork in forker.list['ToFork']:
+            basefile = [cmd.split('=',1)[1] for cmd in shlex.split(fork) if cmd.startswith('basefile=')][-1]
+            if os.path.basename(basefile) in self.fail: continue
+            for ext in ['gablam.tdt','local.tdt','unique.tdt']: writeUnique('{0}.{1}'.format(basefile,ext),[])
+        return True
+    def patch(self): return mock.patch('rje_forker.Forker.run',lambda forker: self(forker))
+    def forced(self): return [fork for fork in self.forked[-1] if 'force=T' in shlex.split(fork)]
+
+def randomSeq(length,seed): ### Returns a reproducible random DNA sequence
+    rng = random.Random(seed)
+    return ''.join([rng.choice('ACGT') for i in range(length)])
+
+def writeUnique(filename,hits): ### Writes a numtsearch.unique.tdt table of hits
+    OUT = open(filename,'w')
+    OUT.write('{0}\n'.format('\t'.join(UNIQUE)))
+    for (i,(qstart,qend,sstart,send)) in enumerate(hits):
+        hlen = qend - qstart + 1
+        OUT.write('{0}\n'.format('\t'.join(['{0}'.format(x) for x in ['mt2X','chr1',i+1,2*hlen,1e-10,hlen,hlen,hlen,qstart,qend,sstart,send]])))
+    OUT.close()
+
+class NUMTFinderTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        open('mt.fasta','w').write('>mt\n{0}\n'.format(randomSeq(MTLEN,1)))
+        open('asm.fasta','w').write('>chr1\n{0}\n'.format(randomSeq(2000,2)))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir)
+
+    def numtFinder(self,cmds=[]):  ### Returns a set up NUMTFinder object with the test mtDNA and assembly
+        cmd_list = ['i=-1','v=-1','mtdna=mt.fasta','seqin=asm.fasta','basefile=test'] + cmds
+        log = rje.setLog(numtfinder.makeInfo(),rje.Out(),cmd_list+['log=test.log'])
+        nf = numtfinder.NUMTFinder(log,cmd_list)
+        self.assertTrue(nf.setup())
+        nf.mtQuery()
+        return nf
+
+    def testMTQueryBlankLine(self): ### The 2X mtDNA query matches mtLen when the mtDNA record has a blank line
+        (seq1,seq2) = (randomSeq(120,7),randomSeq(80,8))
+        open('mt.fasta','w').write('>mt\n{0}\n\n{1}\n'.format(seq1,seq2))
+        nf = self.numtFinder(['force=T'])
+        mtlen = nf.getInt('mtLen')
+        mt2x = ''.join([line.strip() for line in open('mt2X.fasta') if not line.startswith('>')])
+        self.assertEqual(len(mt2x),2*mtlen)
+        self.assertEqual(mt2x[:mtlen],mt2x[mtlen:])
+
+    def testCircleSplitRID(self):  ### Fragments spanning the circularisation point are split into two rid entries
+        writeUnique('test.numtsearch.unique.tdt',HITS)
+        nf = self.numtFinder(['force=T'])
+        nf.numtProcess()
+        nf.coverageOutputs()
+        riddb = nf.db('rid')
+        spanx = len([hit for hit in HITS if hit[1] > MTLEN])
+        self.assertEqual(riddb.entryNum(),len(HITS)+spanx)
+        self.assertEqual(sorted([entry['RID'] for entry in riddb.entries()]),list(range(1,len(HITS)+spanx+1)))
+        ridpos = [(entry['Start'],entry['End']) for entry in riddb.entries()]
+        self.assertTrue((1,HITS[1][1]-MTLEN) in ridpos)
+        self.assertTrue((HITS[1][0],MTLEN) in ridpos)
+
+    def testBlastnRerun(self):  ### A changed search setting re-runs blastn rather than re-using the blast6 file
+        fake = FakeSystem()
+        with mock.patch('os.system',fake):
+            self.numtFinder(['searchmethod=blastn','blaste=1e-4','force=T']).numtSearch()
+            self.assertEqual(len(fake.programs('blastn')),1)
+            self.numtFinder(['searchmethod=blastn','blaste=1e-4']).numtSearch()
+            self.assertEqual(len(fake.programs('blastn')),1)
+            self.numtFinder(['searchmethod=blastn','blaste=1e-5']).numtSearch()
+            self.assertEqual(len(fake.programs('blastn')),2)
+            self.assertTrue('-evalue 1.000000e-05' in fake.programs('blastn')[-1])
+
+    def testBlastnFailure(self):    ### A failed blastn re-run does not re-use the old blast6 file
+        with mock.patch('os.system',FakeSystem()):
+            self.assertTrue(self.numtFinder(['searchmethod=blastn','force=T']).blastnSearch())
+        self.assertTrue(os.path.exists('test.numtsearch.blast6'))
+        fake = FakeSystem(fail=True)
+        with mock.patch('os.system',fake):
+            self.assertFalse(self.numtFinder(['searchmethod=blastn']).blastnSearch(rerun=True))
+            self.assertEqual(len(fake.programs('blastn')),1)
+        self.assertFalse(os.path.exists('test.numtsearch.blast6'))
+
+    def writeChunkAssembly(self):   ### Writes a four-sequence assembly for split search tests
+        OUT = open('asm.fasta','w')
+        for i in range(4): OUT.write('>chr{0}\n{1}\n'.format(i+1,randomSeq(2000-100*i,i+2)))
+        OUT.close()
+
+    def testBlastnSeqIDs(self): ### BLAST+ -parse_seqids hit IDs are converted back to assembly sequence names
+        OUT = open('asm.fasta','w')
+        for name in ['NC_000001.11','chr2']: OUT.write('>{0}\n{1}\n'.format(name,randomSeq(2000,len(name))))
+        OUT.close()
+        with mock.patch('os.system',FakeSystem(hitids=['ref|NC_000001.11|','lcl|chr2'])):
+            nf = self.numtFinder(['searchmethod=blastn','force=T'])
+            nf.numtSearch()
+        nf.numtProcess()
+        self.assertEqual(sorted(set(nf.db('numtfrag').dataList(nf.db('numtfrag').entries(),'SeqName'))),['NC_000001.11','chr2'])
+        self.assertTrue(nf.blockFasta())
+        blocknames = [line[1:].split()[0] for line in open('test.numtblock.fasta') if line.startswith('>')]
+        self.assertEqual(sorted(blocknames),['NC_000001.11.0100-1040','chr2.0500-0550'])
+        nf = self.numtFinder(['exclude=NC_000001.11'])
+        nf.numtProcess()
+        self.assertEqual(sorted(set(nf.db('numtfrag').dataList(nf.db('numtfrag').entries(),'SeqName'))),['chr2'])
+        self.assertEqual(numtfinder.blastSeqID('lcl|chr9',set()),'chr9')
+        self.assertEqual(numtfinder.blastSeqID('ref|NC_000001.11|',set(['ref|NC_000001.11|'])),'ref|NC_000001.11|')
+
+    def testSplitSearchChunks(self):    ### Changed chunks are re-written and forced, and old chunks are removed
+        self.writeChunkAssembly()
+        chunkdir = 'test.numtsearch.chunks/'
+        fake = FakeForker()
+        with fake.patch():
+            self.assertTrue(self.numtFinder(['forks=3']).splitSearch([]))
+            self.assertTrue(os.path.exists(chunkdir+'chunk3.fasta'))
+            self.assertTrue(self.numtFinder(['forks=3']).splitSearch([]))
+            self.assertEqual(len(fake.forced()),0)
+            self.assertTrue(self.numtFinder(['forks=2']).splitSearch([]))
+            self.assertFalse(os.path.exists(chunkdir+'chunk3.fasta'))
+            self.assertEqual(len(fake.forced()),2)
+            self.assertTrue(self.numtFinder(['forks=2']).splitSearch([],rerun=True))
+            self.assertEqual(len(fake.forced()),2)
+        chunkseq = []
+        for i in range(2): chunkseq += [line[1:].strip() for line in open('{0}chunk{1}.fasta'.format(chunkdir,i+1)) if line.startswith('>')]
+        self.assertEqual(sorted(chunkseq),['chr1','chr2','chr3','chr4'])
+
+    def testSplitSearchFailedChunk(self):   ### A failed chunk search fails the split search rather than losing its hits
+        self.writeChunkAssembly()
+        chunkdir = 'test.numtsearch.chunks/'
+        with FakeForker().patch():
+            self.assertTrue(self.numtFinder(['forks=2']).splitSearch([]))
+        self.assertTrue(os.path.exists(chunkdir+'chunk1.unique.tdt'))
+        #i# A re-run chunk that fails must not leave its earlier unique hits to be combined
+        with FakeForker(fail=['chunk1']).patch():
+            self.assertFalse(self.numtFinder(['forks=2']).splitSearch([],rerun=True))
+        self.assertFalse(os.path.exists(chunkdir+'chunk1.unique.tdt'))
+        self.assertTrue(os.path.exists(chunkdir+'chunk1.fasta'))
+
+    def testSplitSearchQuoting(self):   ### Forked chunk commands survive shell parsing of quotes and spaces
+        self.writeChunkAssembly()
+        fake = FakeForker()
+        gabcmd = ["description=mt's test","fasdir=numt fasta/"]
+        with fake.patch(), mock.patch('sys.executable','/opt/my python/bin/python'):
+            self.assertTrue(self.numtFinder(['forks=2']).splitSearch(gabcmd))
+        for fork in fake.forked[-1]:
+            args = shlex.split(fork)
+            self.assertEqual(args[0],'/opt/my python/bin/python')
+            self.assertTrue(args[1].endswith('gablam.py'))
+            self.assertEqual(args[2:4],gabcmd)
+
+    def testBlastDBStamp(self): ### An unchanged assembly newer than its BLAST database re-uses the database
+        import rje_blast_V2
+        nf = self.numtFinder()
+        dbfiles = ['asm.fasta.{0}'.format(suf) for suf in ['nhr','nin','nsq','nog','ndb']]
+        for dbfile in dbfiles: open(dbfile,'w').write('db\n')
+        self.assertTrue(nf.blastDBStamp(save=True))
+        #i# Make the database older than the (unchanged) assembly
+        for dbfile in dbfiles: os.utime(dbfile,(1000000000,1000000000))
+        self.assertFalse(rje_blast_V2.checkForDB('asm.fasta',protein=False))
+        self.assertTrue(nf.blastDBStamp())
+        self.assertTrue(rje_blast_V2.checkForDB('asm.fasta',protein=False))
+        #i# Missing .nog: checkForDB() would rebuild the database, so it is not validated
+        for dbfile in dbfiles: os.utime(dbfile,(1000000000,1000000000))
+        os.unlink('asm.fasta.nog')
+        self.assertFalse(nf.blastDBStamp())
+        #i# Changed assembly
+        open('asm.fasta.nog','w').write('db\n')
+        for dbfile in dbfiles: os.utime(dbfile,(1000000000,1000000000))
+        open('asm.fasta','a').write('>chr2\n{0}\n'.format(randomSeq(100,3)))
+        self.assertFalse(nf.blastDBStamp())
+
+    def testGablamRerun(self):  ### A changed search setting re-runs GABLAM with force=T for its own outputs
+        FakeGABLAM.runs = []
+        with mock.patch('gablam.GABLAM',FakeGABLAM):
+            self.numtFinder(['blaste=1e-4']).numtSearch()
+            self.numtFinder(['blaste=1e-4']).numtSearch()
+            self.assertEqual(len(FakeGABLAM.runs),1)
+            self.assertFalse(FakeGABLAM(None,FakeGABLAM.runs[-1]).force())
+            self.numtFinder(['blaste=1e-5']).numtSearch()
+            self.assertEqual(len(FakeGABLAM.runs),2)
+            self.assertTrue(FakeGABLAM(None,FakeGABLAM.runs[-1]).force())
+
+    def testSearchFingerprint(self):    ### A same-size edit in the middle of a large assembly changes the search fingerprint
+        sequence = randomSeq(3000000,5)
+        open('asm.fasta','w').write('>chr1\n{0}\n'.format(sequence))
+        nf = self.numtFinder()
+        fingerprint = nf.phaseFingerprint('numtsearch')
+        nf.savePhase('numtsearch',fingerprint)
+        mid = len(sequence) // 2
+        edit = {'A':'C','C':'A','G':'T','T':'G'}[sequence[mid]]
+        open('asm.fasta','w').write('>chr1\n{0}{1}{2}\n'.format(sequence[:mid],edit,sequence[mid+1:]))
+        self.assertNotEqual(nf.phaseFingerprint('numtsearch'),fingerprint)
+        self.assertTrue(nf.phaseChanged('numtsearch',nf.phaseFingerprint('numtsearch')))
+
+    def testCoverageRerun(self):    ### Changed NUMT fragments regenerate the coverage outputs with force=F
+        writeUnique('test.numtsearch.unique.tdt',HITS)
+        nf = self.numtFinder()
+        nf.numtProcess()
+        nf.coverageOutputs()
+        covfile = 'test.numtfrag.coverage.tdt'
+        coverage = open(covfile,'r').read()
+        writeUnique('test.numtsearch.unique.tdt',HITS+[(100,170,1500,1570)])
+        nf = self.numtFinder()
+        nf.numtProcess()
+        self.assertEqual(nf.db('numtfrag').entryNum(),len(HITS)+1)
+        nf.coverageOutputs()
+        self.assertNotEqual(open(covfile,'r').read(),coverage)
+
+if __name__ == '__main__': unittest.main()